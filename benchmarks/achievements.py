@@ -0,0 +1,169 @@
+"""
+Compares checking every achievement after a command against only checking the ones whose
+inputs changed, for a user with a full score history
+
+Usage: python -m benchmarks.achievements --runs 200
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from challenges.achievements import (
+    achievement_index,
+    categories,
+    check_achievements,
+)
+from data.constants import PREMIUM_PLUS_SAVE_AMT, TEST_ZONES
+from helpers.user import ScoreStats
+
+
+class FakeUser(SimpleNamespace):
+    """The fields of User that the achievements read"""
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    @property
+    def highest_speed(self):
+        return max(s.wpm for s in self.highspeed.values())
+
+
+def _get_score(now: datetime, i: int):
+    return SimpleNamespace(
+        wpm=random.uniform(60, 130),
+        raw=random.uniform(60, 140),
+        acc=random.uniform(85, 100),
+        cw=random.randint(20, 50),
+        tw=50,
+        is_race=random.random() < 0.1,
+        test_type_int=random.randrange(3),
+        timestamp=now - timedelta(minutes=i),
+    )
+
+
+def _get_user():
+    now = datetime.utcnow()
+
+    scores = [_get_score(now, i) for i in range(PREMIUM_PLUS_SAVE_AMT)][::-1]
+
+    return FakeUser(
+        id=1,
+        scores=scores,
+        stats=ScoreStats.from_scores(scores),
+        highspeed={z: _get_score(now, 0) for z in TEST_ZONES},
+        achievements={},
+        language="english",
+        theme=["#000000", "#ffffff"],
+        badges=["gold_plant", "thomas"],
+        cmds_run=["tt", "race", "profile", "leaderboard", "challenges"],
+        streak=30,
+        votes=12,
+        created_at=now - timedelta(days=100),
+    )
+
+
+def _get_ctx():
+    async def get_season_info():
+        return {"enabled": True, "badges": ["gold_plant", "thomas", "gold_badge"]}
+
+    bot = SimpleNamespace(
+        cmds_run={},
+        walk_application_commands=lambda: [],
+        mongo=SimpleNamespace(get_season_info=get_season_info),
+    )
+
+    return SimpleNamespace(bot=bot, achievements_completed=[])
+
+
+async def full_scan(ctx, user):
+    """How the achievements were checked before they were indexed"""
+    for iii, cv in enumerate(categories.values()):
+        for ii, c in enumerate(cv.challenges):
+            a = sum(c, []) if isinstance(c, list) else [c]
+
+            all_names = [b.name for b in a]
+
+            for i, n in enumerate(a):
+                a_count = all_names[: i + 1].count(n.name)
+
+                if a_count <= len(user.achievements.get(n.name, [])):
+                    continue
+
+                if (
+                    await n.is_completed(ctx, user)
+                    or n.name in ctx.achievements_completed
+                ):
+                    yield n, i if all_names.count(n.name) > 1 else None, cv, (iii, ii)
+
+
+async def earn_achievements(ctx, user):
+    """Gives the user every achievement that they have completed, like after a command"""
+    while True:
+        earned = [r async for r in check_achievements(ctx, user)]
+
+        if not earned:
+            return
+
+        for a, count, *_ in earned:
+            current = user.achievements.setdefault(a.name, [])
+            current.insert(0 if count is None else count, datetime.utcnow())
+
+
+async def measure(check, runs: int):
+    start = time.perf_counter()
+
+    for _ in range(runs):
+        async for _ in check():
+            pass
+
+    return (time.perf_counter() - start) / runs
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=200)
+
+    args = parser.parse_args()
+
+    ctx = _get_ctx()
+    user = _get_user()
+
+    await earn_achievements(ctx, user)
+
+    earned = sum(len(v) for v in user.achievements.values())
+
+    print(
+        f"{len(achievement_index.entries)} achievements, {earned} earned, "
+        f"{len(user.scores)} scores\n"
+    )
+
+    results = {
+        "full scan (before)": lambda: full_scan(ctx, user),
+        "indexed, every achievement": lambda: check_achievements(ctx, user),
+        "indexed, after a test": lambda: check_achievements(
+            ctx, user, {"scores", "highspeed"}
+        ),
+        "indexed, nothing changed": lambda: check_achievements(ctx, user, set()),
+    }
+
+    for name, check in results.items():
+        elapsed = await measure(check, args.runs)
+
+        print(f"{name + ':':<30} {elapsed * 1e6:>9.1f}us per check")
+
+    start = time.perf_counter()
+
+    for _ in range(args.runs):
+        achievement_index.get_inputs(ctx, user)
+
+    elapsed = (time.perf_counter() - start) / args.runs
+
+    print(f"{'reading the inputs:':<30} {elapsed * 1e6:>9.1f}us per check")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
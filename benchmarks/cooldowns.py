@@ -0,0 +1,81 @@
+"""
+Measures the overhead per command of the redis backed cooldowns against the in memory version
+
+Usage: python -m benchmarks.cooldowns --url redis://localhost:6379
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from redis import asyncio as aioredis
+
+from helpers.expiry import ExpiringMap
+from helpers.shared import SharedExpiringMap
+
+COMMANDS = ["tt", "race", "profile", "lb", "stats"]
+
+
+def _get_keys(amount: int, users: int):
+    return [(random.randrange(users), random.choice(COMMANDS)) for _ in range(amount)]
+
+
+async def memory_path(keys, cooldown: float):
+    cooldowns = ExpiringMap()
+
+    for key in keys:
+        if cooldowns.get(key) is None:
+            cooldowns.set(key, time.time() + cooldown)
+
+
+async def redis_path(pool, keys, cooldown: float):
+    cooldowns = SharedExpiringMap(
+        SimpleNamespace(redis=pool), "benchmark.cooldown", cache_remote=True
+    )
+
+    for key in keys:
+        await cooldowns.add(key, time.time() + cooldown)
+
+    return cooldowns.local.stats["set"]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="redis://localhost:6379")
+    parser.add_argument("--commands", type=int, default=50_000)
+    parser.add_argument("--users", type=int, nargs="+", default=[100, 10_000])
+    parser.add_argument("--cooldown", type=float, default=5)
+
+    args = parser.parse_args()
+
+    pool = await aioredis.from_url(args.url)
+
+    for users in args.users:
+        keys = _get_keys(args.commands, users)
+
+        start = time.perf_counter()
+        await memory_path(keys, args.cooldown)
+        memory_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        redis_calls = await redis_path(pool, keys, args.cooldown)
+        redis_time = time.perf_counter() - start
+
+        # Keys that were served by the local fast path
+        hit_rate = 1 - redis_calls / len(keys)
+
+        print(f"{users:,} users, {len(keys):,} commands:")
+        print(f"  memory: {memory_time / len(keys) * 1e6:.2f}us per command")
+        print(f"  redis:  {redis_time / len(keys) * 1e6:.2f}us per command")
+        print(f"  local fast path: {hit_rate:.1%}")
+
+        async for key in pool.scan_iter("benchmark.cooldown.*"):
+            await pool.delete(key)
+
+    await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
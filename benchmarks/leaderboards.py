@@ -0,0 +1,146 @@
+"""
+Compares computing the leaderboards in Python against the Mongo aggregations
+
+Usage: python -m benchmarks.leaderboards --uri mongodb://localhost:27017
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from data.constants import LB_LENGTH, TEST_ZONES
+from helpers.aggregation import FieldAggregation, Rolling24hAggregation
+from helpers.user import TOTAL_24H_INTERVALS, RollingStat, get_24h_interval
+
+# Same stats as the leaderboards defined in WordPractice
+CATEGORIES = {
+    "lb.0.0": (lambda u: u["words"], FieldAggregation("words")),
+    "lb.1.0": (lambda u: u["xp"], FieldAggregation("xp")),
+    "lb.2.0": (
+        lambda u: RollingStat(u["ring_xp_24h"]).sum,
+        Rolling24hAggregation("ring_xp_24h"),
+    ),
+    "lb.2.1": (
+        lambda u: RollingStat(u["ring_words_24h"]).sum,
+        Rolling24hAggregation("ring_words_24h"),
+    ),
+} | {
+    f"lb.3.{i}": (
+        lambda u, z=z: u["highspeed"][z]["wpm"],
+        FieldAggregation(f"highspeed.{z}.wpm"),
+    )
+    for i, z in enumerate(TEST_ZONES.keys())
+}
+
+INSERT_BATCH = 10_000
+
+
+def _generate_ring(max_amount: int):
+    ring = RollingStat()
+
+    # Last addition in the last two days
+    head = get_24h_interval() - random.randint(0, TOTAL_24H_INTERVALS * 2)
+
+    for i in range(head - TOTAL_24H_INTERVALS + 1, head + 1):
+        ring.add(random.randint(0, max_amount), i)
+
+    return ring.to_dict()
+
+
+def _generate_user(user_id: int):
+    active = random.random() < 0.2
+
+    return {
+        "_id": user_id,
+        "words": random.randint(0, 500_000),
+        "xp": random.randint(0, 100_000),
+        "ring_xp_24h": _generate_ring(300) if active else {},
+        "ring_words_24h": _generate_ring(50) if active else {},
+        "highspeed": {
+            z: {"wpm": round(random.uniform(0, 200), 2)} for z in TEST_ZONES.keys()
+        },
+    }
+
+
+async def populate(db, amount: int):
+    await db.users.drop()
+
+    for start in range(0, amount, INSERT_BATCH):
+        end = min(start + INSERT_BATCH, amount)
+
+        await db.users.insert_many(
+            [_generate_user(i) for i in range(start, end)], ordered=False
+        )
+
+    for _, aggregation in CATEGORIES.values():
+        await db.users.create_index(aggregation.index)
+
+
+async def python_path(db):
+    users = [u async for u in db.users.find()]
+
+    lbs = {}
+
+    for name, (get_stat, _) in CATEGORIES.items():
+        values = [(u["_id"], get_stat(u)) for u in users]
+
+        lbs[name] = sorted(values, key=lambda x: x[1], reverse=True)[:LB_LENGTH]
+
+    return lbs
+
+
+async def aggregation_path(db):
+    lbs = {}
+
+    for name, (_, aggregation) in CATEGORIES.items():
+        cursor = db.users.aggregate(aggregation.pipeline())
+
+        lbs[name] = [(u["_id"], u.get("value", 0)) async for u in cursor]
+
+    return lbs
+
+
+async def timed(func, *args):
+    start = time.perf_counter()
+
+    result = await func(*args)
+
+    return result, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="wordpractice_benchmark")
+    parser.add_argument("--users", type=int, nargs="+", default=[100_000, 1_000_000])
+
+    args = parser.parse_args()
+
+    db = AsyncIOMotorClient(args.uri)[args.database]
+
+    for amount in args.users:
+        print(f"Populating {amount:,} synthetic users...")
+        await populate(db, amount)
+
+        python_lbs, python_time = await timed(python_path, db)
+        aggregation_lbs, aggregation_time = await timed(aggregation_path, db)
+
+        print(f"  python:      {python_time:.2f}s")
+        print(f"  aggregation: {aggregation_time:.2f}s")
+
+        # The top values should line up (ties can be ordered differently)
+        for name in CATEGORIES:
+            expected = [v for _, v in python_lbs[name] if v]
+            actual = [v for _, v in aggregation_lbs[name] if v]
+
+            if expected != actual:
+                print(f"  mismatch in {name}")
+
+    await db.client.drop_database(args.database)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,699 @@
+"""
+Drives the bot with simulated users without connecting to Discord
+
+The bot is created as usual, but the gateway is replaced by events built by the harness
+and the REST and webhook layers by fakes that answer with generated messages. Mongo and
+redis have to be running locally, a scratch database (and an empty redis database) is used
+and removed at the end
+
+Usage: python -m benchmarks.loadtest --users 50 --duration 120
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import os
+import random
+import re
+import resource
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from statistics import quantiles
+
+import discord
+from discord.webhook import async_
+
+# Settings that the bot requires, the harness never talks to Discord
+FAKE_WEBHOOK = "https://discord.com/api/webhooks/1/loadtest"
+
+ENV_DEFAULTS = {
+    "BOT_TOKEN": "loadtest",
+    "COMMAND_LOG": FAKE_WEBHOOK,
+    "TEST_LOG": FAKE_WEBHOOK,
+    "IMPORTANT_LOG": FAKE_WEBHOOK,
+    "ERROR_LOG": FAKE_WEBHOOK,
+    "GUILD_LOG": FAKE_WEBHOOK,
+    "SUPPORT_GUILD_ID": "1",
+    "DEBUG_GUILD_ID": "1",
+    "GRAPH_CDN_SECRET": "loadtest",
+    "TESTING": "True",
+}
+
+GUILD_ID = 100
+BOT_ID = 200
+USER_ID_START = 10_000
+CHANNEL_ID_START = 1_000
+
+# Cooldown of each command for regular users (seconds)
+COMMANDS = {
+    "tt": 5,
+    "race": 6,
+    "leaderboard": 10,
+    "profile": 7,
+    "challenges": 5,
+}
+
+# Relative frequency of each command
+WEIGHTS = {"tt": 40, "race": 10, "leaderboard": 15, "profile": 20, "challenges": 15}
+
+TEST_LENGTH = 20
+
+# Sample of words typed by the simulated users
+WORDS = "the quick brown fox jumps over lazy dog while typing some random words fast".split()
+
+
+_increment = itertools.count()
+
+
+def _snowflake(dt: datetime = None):
+    # The increment keeps the ids of messages created in the same millisecond unique
+    time_id = discord.utils.time_snowflake(dt or datetime.now(timezone.utc))
+
+    return time_id + next(_increment) % 4096
+
+
+def _iso(dt: datetime = None):
+    return (dt or datetime.now(timezone.utc)).isoformat()
+
+
+def _user_payload(user_id: int, bot=False):
+    return {
+        "id": str(user_id),
+        "username": f"{'bot' if bot else 'user'}{user_id}",
+        "discriminator": "0001",
+        "avatar": None,
+        "bot": bot,
+    }
+
+
+def _member_payload(user_id: int, bot=False):
+    return {
+        "user": _user_payload(user_id, bot),
+        "roles": [],
+        "joined_at": _iso(),
+        "deaf": False,
+        "mute": False,
+    }
+
+
+def _get_payload(payload: dict = None, form: list = None):
+    """Message payload from a json body or the payload_json part of a multipart form"""
+    if payload is not None:
+        return payload
+
+    for part in form or []:
+        if part.get("name") == "payload_json":
+            return json.loads(part["value"])
+
+    return {}
+
+
+class FakeDiscord:
+    """
+    Answers the REST and webhook requests of the bot
+
+    Messages sent by the bot are built from the request and queued for the channel,
+    so that the simulated users can wait for them
+    """
+
+    def __init__(self):
+        self.messages = {}  # message_id: payload
+        self.inboxes = defaultdict(asyncio.Queue)  # channel_id: bot messages
+
+        # Interactions by token
+        self.channels = {}  # token: channel_id
+        self.components = {}  # token: message of the component that was used
+        self.originals = {}  # token: message sent as the response
+
+        # Requests by route {method path: count}
+        self.requests = Counter()
+
+    def create_message(self, channel_id: int, data: dict, files=None):
+        message_id = _snowflake()
+
+        attachments = [
+            {
+                "id": str(_snowflake()),
+                "filename": f.filename,
+                "size": 0,
+                "url": f"https://cdn.discordapp.com/{f.filename}",
+                "proxy_url": f"https://cdn.discordapp.com/{f.filename}",
+            }
+            for f in files or []
+        ]
+
+        message = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "guild_id": str(GUILD_ID),
+            "author": _user_payload(BOT_ID, bot=True),
+            "content": data.get("content") or "",
+            "timestamp": _iso(),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": attachments,
+            "embeds": data.get("embeds") or [],
+            "components": data.get("components") or [],
+            "pinned": False,
+            "type": 0,
+        }
+
+        self.messages[message_id] = message
+        self.inboxes[channel_id].put_nowait(message)
+
+        return message
+
+    def edit_message(self, message_id: int, data: dict):
+        message = self.messages.get(message_id)
+
+        if message is None:
+            return None
+
+        for field in ("content", "embeds", "components"):
+            if field in data:
+                message[field] = data[field] or ([] if field != "content" else "")
+
+        message["edited_timestamp"] = _iso()
+
+        self.inboxes[int(message["channel_id"])].put_nowait(message)
+
+        return message
+
+    async def http_request(self, route, *, files=None, form=None, **kwargs):
+        """Replaces HTTPClient.request"""
+        self.requests[f"{route.method} {route.path}"] += 1
+
+        data = _get_payload(kwargs.get("json"), form)
+
+        message_id = re.search(r"/messages/(\d+)", route.url)
+        message_id = int(message_id.group(1)) if message_id else None
+
+        if route.path.endswith("/messages") and route.method == "POST":
+            return self.create_message(int(route.channel_id), data, files)
+
+        if message_id is not None and route.method == "PATCH":
+            return self.edit_message(message_id, data)
+
+        if message_id is not None and route.method == "GET":
+            return self.messages.get(message_id)
+
+        return None
+
+    async def webhook_request(self, route, session=None, **kwargs):
+        """Replaces AsyncWebhookAdapter.request (interaction responses and log webhooks)"""
+        self.requests[f"{route.method} {route.path}"] += 1
+
+        token = route.webhook_token
+        channel_id = self.channels.get(token)
+
+        # Logs sent to the log webhooks
+        if channel_id is None:
+            return None
+
+        data = _get_payload(kwargs.get("payload"), kwargs.get("multipart"))
+        files = kwargs.get("files")
+
+        if route.path.endswith("/callback"):
+            response_type = data.get("type")
+
+            # Responding with a message
+            if response_type == 4:
+                self.originals[token] = self.create_message(
+                    channel_id, data.get("data", {}), files
+                )
+
+            # Editing the message of the component
+            elif response_type == 7:
+                message = self.components[token]
+
+                self.edit_message(int(message["id"]), data.get("data", {}))
+
+            return None
+
+        original = self.originals.get(token)
+
+        if route.path.endswith("@original"):
+            if original is None:
+                return None
+
+            if route.method == "PATCH":
+                return self.edit_message(int(original["id"]), data)
+
+            return original
+
+        # Followup messages
+        if route.method == "POST":
+            return self.create_message(channel_id, data, files)
+
+        return None
+
+
+class SimulatedUser:
+    def __init__(self, harness: "Harness", index: int):
+        self.harness = harness
+        self.user_id = USER_ID_START + index
+        self.channel_id = CHANNEL_ID_START + index
+
+        self.last_run = {}  # command: timestamp
+
+    @property
+    def inbox(self) -> asyncio.Queue:
+        return self.harness.discord.inboxes[self.channel_id]
+
+    def clear_inbox(self):
+        while not self.inbox.empty():
+            self.inbox.get_nowait()
+
+    async def wait_for_bot_message(self, check=None):
+        deadline = time.perf_counter() + self.harness.timeout
+
+        while True:
+            remaining = deadline - time.perf_counter()
+
+            message = await asyncio.wait_for(self.inbox.get(), max(remaining, 0))
+
+            if check is None or check(message):
+                return message
+
+    def send(self, content: str, typing_time: float = 0):
+        # The message is dated in the future instead of waiting for the user to type
+        created_at = datetime.now(timezone.utc) + timedelta(seconds=typing_time)
+
+        self.harness.bot._connection.parse_message_create(
+            {
+                "id": str(_snowflake(created_at)),
+                "channel_id": str(self.channel_id),
+                "guild_id": str(GUILD_ID),
+                "author": _user_payload(self.user_id),
+                "member": _member_payload(self.user_id),
+                "content": content,
+                "timestamp": _iso(created_at),
+                "edited_timestamp": None,
+                "tts": False,
+                "mention_everyone": False,
+                "mentions": [],
+                "mention_roles": [],
+                "attachments": [],
+                "embeds": [],
+                "pinned": False,
+                "type": 0,
+            }
+        )
+
+    def click(self, message: dict, label: str):
+        custom_id = next(
+            c["custom_id"]
+            for row in message["components"]
+            for c in row["components"]
+            if c.get("label") == label and "custom_id" in c
+        )
+
+        token = os.urandom(16).hex()
+
+        self.harness.discord.channels[token] = self.channel_id
+        self.harness.discord.components[token] = message
+
+        self.harness.bot._connection.parse_interaction_create(
+            {
+                "id": str(_snowflake()),
+                "application_id": str(BOT_ID),
+                "type": 3,
+                "token": token,
+                "version": 1,
+                "guild_id": str(GUILD_ID),
+                "channel_id": str(self.channel_id),
+                "member": _member_payload(self.user_id) | {"permissions": "0"},
+                "message": message,
+                "data": {"custom_id": custom_id, "component_type": 2},
+            }
+        )
+
+    def type_test(self):
+        words = [random.choice(WORDS) for _ in range(TEST_LENGTH)]
+
+        typing_time = TEST_LENGTH / self.harness.wpm * 60
+
+        self.send(" ".join(words), typing_time)
+
+    async def run_command(self, command: str):
+        self.clear_inbox()
+
+        timer = self.harness.timer
+
+        self.send(
+            f"%{command}" + (f" {TEST_LENGTH}" if command in ("tt", "race") else "")
+        )
+
+        with timer(command):
+            first = await self.wait_for_bot_message()
+
+        if command == "tt":
+            with timer("tt (image)"):
+                await self.wait_for_bot_message(_has_attachment("test"))
+
+            self.type_test()
+
+            with timer("tt (results)"):
+                await self.wait_for_bot_message(_has_title("Typing Test Results"))
+
+        elif command == "race":
+            # The leader starts the race by joining it
+            self.click(first, "Join")
+
+            with timer("race (image)"):
+                await self.wait_for_bot_message(_has_attachment("test"))
+
+            self.type_test()
+
+            with timer("race (results)"):
+                await self.wait_for_bot_message(_has_title("Race Results"))
+
+    async def run(self, until: float):
+        while time.perf_counter() < until:
+            now = time.time()
+
+            ready = [c for c in COMMANDS if now - self.last_run.get(c, 0) > COMMANDS[c]]
+
+            # Waiting for a cooldown to run out
+            if not ready:
+                await asyncio.sleep(1)
+                continue
+
+            command = random.choices(ready, [WEIGHTS[c] for c in ready])[0]
+
+            self.last_run[command] = time.time()
+
+            try:
+                await self.run_command(command)
+            except asyncio.TimeoutError:
+                # Counted by the step that timed out
+                pass
+            except Exception as e:
+                self.harness.errors[f"{command}: {type(e).__name__}"] += 1
+
+            await asyncio.sleep(random.uniform(0, self.harness.think_time * 2))
+
+
+def _has_attachment(name: str):
+    return lambda m: any(a["filename"].startswith(name) for a in m["attachments"])
+
+
+def _has_title(title: str):
+    return lambda m: any((e.get("title") or "").startswith(title) for e in m["embeds"])
+
+
+def _get_memory():
+    """Resident memory in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # Peak memory on platforms without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+class Harness:
+    def __init__(self, args):
+        self.users_amt = args.users
+        self.duration = args.duration
+        self.ramp = args.ramp
+        self.think_time = args.think
+        self.timeout = args.timeout
+        self.wpm = args.wpm
+
+        self.bot = None
+        self.discord = FakeDiscord()
+
+        # Only set once the redis database is known to be empty, so that data isn't flushed
+        self.owns_redis = False
+
+        self.latencies = defaultdict(list)  # step: [seconds]
+        self.errors = Counter()
+        self.memory = []  # [(elapsed, MB, objects)]
+
+    @contextmanager
+    def timer(self, step: str):
+        start = time.perf_counter()
+
+        try:
+            yield
+        except asyncio.TimeoutError:
+            self.errors[f"{step}: timed out"] += 1
+            raise
+
+        self.latencies[step].append(time.perf_counter() - start)
+
+    def create_bot(self, load_time: float):
+        # Imported after the environment is set up for the config
+        import cogs.discord.typing as typing_cog
+        from bot import WordPractice
+
+        # Webhooks use the adapter in the context, which the bot's tasks inherit
+        adapter = async_.AsyncWebhookAdapter()
+        adapter.request = self.discord.webhook_request
+        async_.async_context.set(adapter)
+
+        intents = discord.Intents.none()
+        intents.message_content = True
+        intents.messages = True
+        intents.guilds = True
+        intents.members = True
+
+        self.bot = bot = WordPractice(
+            command_prefix="%",
+            allowed_mentions=discord.AllowedMentions(everyone=False, roles=False),
+            chunk_guilds_at_startup=False,
+            help_command=None,
+            intents=intents,
+        )
+
+        bot.http.request = self.discord.http_request
+
+        # Time that the test image is shown before the test starts
+        typing_cog.TEST_LOAD_TIME = load_time
+
+        return bot
+
+    def connect(self):
+        """Builds the state that the gateway would have sent"""
+        state = self.bot._connection
+
+        state.user = discord.ClientUser(state=state, data=_user_payload(BOT_ID, True))
+        state.application_id = BOT_ID
+
+        channels = [
+            {
+                "id": str(CHANNEL_ID_START + i),
+                "type": 0,
+                "name": f"loadtest-{i}",
+                "position": i,
+                "permission_overwrites": [],
+                "nsfw": False,
+            }
+            for i in range(self.users_amt)
+        ]
+
+        members = [_member_payload(BOT_ID, True)] + [
+            _member_payload(USER_ID_START + i) for i in range(self.users_amt)
+        ]
+
+        state._add_guild_from_data(
+            {
+                "id": str(GUILD_ID),
+                "name": "Load Test",
+                "icon": None,
+                "owner_id": str(BOT_ID),
+                "roles": [
+                    {
+                        "id": str(GUILD_ID),
+                        "name": "@everyone",
+                        "permissions": str(discord.Permissions.all().value),
+                        "position": 0,
+                        "color": 0,
+                        "hoist": False,
+                        "managed": False,
+                        "mentionable": False,
+                    }
+                ],
+                "channels": channels,
+                "members": members,
+                "member_count": len(members),
+                "features": [],
+                "emojis": [],
+                "stickers": [],
+            }
+        )
+
+        self.bot._ready.set()
+
+    async def create_users(self):
+        mongo = self.bot.mongo
+
+        for i in range(self.users_amt):
+            user_id = USER_ID_START + i
+
+            user = mongo.User(
+                id=user_id,
+                name=f"user{user_id}",
+                discriminator="0001",
+                avatar=None,
+                highspeed=mongo.default_score,
+                created_at=datetime.utcnow(),
+                last_streak=datetime.utcnow(),
+            )
+
+            await mongo.replace_user_data(user)
+
+    async def sample_memory(self, start: float):
+        while True:
+            gc.collect()
+
+            self.memory.append(
+                (time.perf_counter() - start, _get_memory(), len(gc.get_objects()))
+            )
+
+            await asyncio.sleep(5)
+
+    async def run(self):
+        redis_cog = self.bot.get_cog("Redis")
+        await redis_cog.wait_until_ready()
+
+        if await self.bot.redis.dbsize():
+            raise SystemExit("The redis database has to be empty, use another one")
+
+        self.owns_redis = True
+
+        self.connect()
+
+        await self.create_users()
+
+        users = [SimulatedUser(self, i) for i in range(self.users_amt)]
+
+        start = time.perf_counter()
+        until = start + self.duration
+
+        sampler = asyncio.create_task(self.sample_memory(start))
+
+        async def run_user(u: SimulatedUser, delay: float):
+            await asyncio.sleep(delay)
+            await u.run(until)
+
+        await asyncio.gather(
+            *[run_user(u, self.ramp * i / self.users_amt) for i, u in enumerate(users)]
+        )
+
+        elapsed = time.perf_counter() - start
+
+        sampler.cancel()
+
+        self.report(elapsed)
+
+    async def cleanup(self):
+        db = self.bot.mongo.db
+
+        await db.client.drop_database(db.name)
+
+        if self.owns_redis:
+            await self.bot.redis.flushdb()
+
+        await self.bot.close()
+
+    def report(self, elapsed: float):
+        commands = sum(len(self.latencies[c]) for c in COMMANDS)
+
+        print(f"{self.users_amt} users for {elapsed:.0f}s")
+        print(f"Throughput: {commands / elapsed:.2f} commands/s\n")
+
+        print(f"{'step':<18} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+
+        for step, values in sorted(self.latencies.items()):
+            if len(values) > 1:
+                p = quantiles(values, n=100, method="inclusive")
+                p50, p95, p99 = p[49], p[94], p[98]
+            else:
+                p50 = p95 = p99 = values[0]
+
+            print(
+                f"{step:<18} {len(values):>7} {p50 * 1e3:>7.1f}ms {p95 * 1e3:>7.1f}ms "
+                f"{p99 * 1e3:>7.1f}ms {max(values) * 1e3:>7.1f}ms"
+            )
+
+        if self.errors:
+            print("\nErrors:")
+
+            for error, amount in self.errors.most_common():
+                print(f"  {error}: {amount}")
+
+        if self.memory:
+            (_, first_mb, first_objs), (_, last_mb, last_objs) = (
+                self.memory[0],
+                self.memory[-1],
+            )
+
+            print(
+                f"\nMemory: {first_mb:.0f}MB -> {last_mb:.0f}MB ({last_mb - first_mb:+.1f}MB), "
+                f"objects: {first_objs:,} -> {last_objs:,} ({last_objs - first_objs:+,})"
+            )
+
+        print("\nRequests to Discord:")
+
+        for route, amount in self.discord.requests.most_common(10):
+            print(f"  {route}: {amount}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=120, help="seconds")
+    parser.add_argument(
+        "--ramp", type=float, default=10, help="seconds to start every user"
+    )
+    parser.add_argument(
+        "--think", type=float, default=2, help="average seconds between commands"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=30, help="seconds to wait for a response"
+    )
+    parser.add_argument("--wpm", type=float, default=80, help="typing speed of users")
+    parser.add_argument(
+        "--load-time",
+        type=float,
+        default=0,
+        help="seconds the test image is shown before a test starts (5 in production)",
+    )
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+
+    args = parser.parse_args()
+
+    # Has to be set before the config is imported
+    os.environ.update(
+        {
+            "DATABASE_URI": args.uri,
+            "DATABASE_NAME": f"loadtest_{int(time.time())}",
+            "REDIS_URL": args.redis_url,
+        }
+    )
+
+    for name, value in ENV_DEFAULTS.items():
+        os.environ.setdefault(name, value)
+
+    harness = Harness(args)
+
+    bot = harness.create_bot(args.load_time)
+
+    try:
+        bot.loop.run_until_complete(harness.run())
+    finally:
+        bot.loop.run_until_complete(harness.cleanup())
+
+
+if __name__ == "__main__":
+    main()
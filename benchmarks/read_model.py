@@ -0,0 +1,131 @@
+"""
+Compares building umongo users from cached documents against the read only users, the time to
+build and read a user and the memory that each user takes
+
+Usage: python -m benchmarks.read_model --users 100 --scores 200 2500
+"""
+
+import argparse
+import gc
+import pickle
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from umongo.frameworks import MotorAsyncIOInstance
+
+from cogs.utils.mongo import register_documents
+from data.constants import TEST_ZONES
+from helpers.read_model import get_read_model
+
+
+def _get_score(now: datetime, i: int):
+    return {
+        "wpm": round(random.uniform(60, 130), 2),
+        "raw": round(random.uniform(60, 140), 2),
+        "acc": round(random.uniform(85, 100), 2),
+        "cw": random.randint(20, 50),
+        "tw": 50,
+        "xp": random.randint(10, 100),
+        "timestamp": now - timedelta(minutes=i),
+        "wrong": ["teh", "adn"],
+    }
+
+
+def _get_document(User, scores: int):
+    """Cached user document, the same as the entries in the user cache"""
+    now = datetime.utcnow()
+
+    user = User(
+        id=random.randint(10**17, 10**18),
+        name="benchmark",
+        discriminator=1234,
+        created_at=now,
+        last_streak=now,
+        highspeed={z: _get_score(now, 0) for z in TEST_ZONES},
+        scores=[_get_score(now, i) for i in range(scores)][::-1],
+        badges=["gold_plant"],
+    )
+
+    return pickle.dumps(user.to_mongo())
+
+
+def read_lb_row(u):
+    return u.id, u.display_name
+
+
+def read_profile(u):
+    return (
+        u.display_name,
+        [s.wpm for s in u.highspeed.values()],
+        u.stats.average,
+        u.xp_24h.sum,
+        u.is_premium,
+    )
+
+
+def measure(build, read, blob: bytes, users: int):
+    # Each cache hit unpickles a new document, they are loaded before tracing
+    # so that only what is built on top of them is counted
+    documents = [pickle.loads(blob) for _ in range(users)]
+
+    gc.collect()
+    tracemalloc.start()
+
+    start = time.perf_counter()
+
+    built = [build(d) for d in documents]
+
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+
+    for u in built:
+        read(u)
+
+    read_time = time.perf_counter() - start
+
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return build_time / users, read_time / users, memory / users
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--scores", type=int, nargs="+", default=[200, 2500])
+
+    args = parser.parse_args()
+
+    # Nothing is sent to the database
+    instance = MotorAsyncIOInstance(AsyncIOMotorClient()["benchmark"])
+
+    bot = SimpleNamespace(lb_fields=frozenset())
+
+    User = register_documents(instance, bot)["User"]
+    ReadOnlyUser = get_read_model(User)
+
+    for scores in args.scores:
+        blob = _get_document(User, scores)
+
+        print(f"{scores:,} scores, {args.users} users:")
+
+        for name, read in (("leaderboard row", read_lb_row), ("profile", read_profile)):
+            for model, build in (
+                ("umongo", User.build_from_mongo),
+                ("read only", ReadOnlyUser),
+            ):
+                build_time, read_time, memory = measure(build, read, blob, args.users)
+
+                print(
+                    f"  {name + ', ' + model + ':':<30} build {build_time * 1e6:>9.1f}us"
+                    f"  read {read_time * 1e6:>9.1f}us  {memory / 1024:>8.1f}KiB per user"
+                )
+
+
+if __name__ == "__main__":
+    main()
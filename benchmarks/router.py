@@ -0,0 +1,109 @@
+"""
+Compares the cost of dispatching messages with the message router against checking a predicate
+for every waiting test (how bot.wait_for works)
+
+Usage: python -m benchmarks.router --tests 1000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from helpers.router import MessageRouter
+
+CHANNELS = 200
+
+
+def _get_message(channel_id: int, author_id: int):
+    return SimpleNamespace(
+        channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(id=author_id)
+    )
+
+
+class PredicateDispatcher:
+    """Same approach as Client.wait_for and Client.dispatch"""
+
+    def __init__(self):
+        self.listeners = []
+
+    async def wait_for(self, check):
+        future = asyncio.get_running_loop().create_future()
+
+        self.listeners.append((future, check))
+
+        return await future
+
+    def dispatch(self, message):
+        removed = []
+
+        for i, (future, check) in enumerate(self.listeners):
+            if future.cancelled():
+                removed.append(i)
+                continue
+
+            if check(message):
+                future.set_result(message)
+                removed.append(i)
+
+        for i in reversed(removed):
+            del self.listeners[i]
+
+
+async def run(dispatcher, wait, tests: int, messages: int):
+    users = [(random.randrange(CHANNELS), user_id) for user_id in range(tests)]
+
+    waiting = [asyncio.create_task(wait(dispatcher, *u)) for u in users]
+
+    # Letting every test start waiting
+    await asyncio.sleep(0)
+
+    # Most messages aren't test inputs, the last ones finish every test
+    traffic = [
+        _get_message(random.randrange(CHANNELS), random.randrange(tests, tests * 10))
+        for _ in range(messages)
+    ] + [_get_message(*u) for u in users]
+
+    start = time.perf_counter()
+
+    for m in traffic:
+        dispatcher.dispatch(m)
+
+    elapsed = time.perf_counter() - start
+
+    await asyncio.gather(*waiting)
+
+    return elapsed / len(traffic)
+
+
+async def predicate_wait(dispatcher, channel_id, author_id):
+    return await dispatcher.wait_for(
+        lambda m: m.channel.id == channel_id and m.author.id == author_id
+    )
+
+
+async def router_wait(router, channel_id, author_id):
+    return await router.wait_for(channel_id, author_id)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tests", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=10_000)
+
+    args = parser.parse_args()
+
+    for tests in args.tests:
+        predicate_time = await run(
+            PredicateDispatcher(), predicate_wait, tests, args.messages
+        )
+        router_time = await run(MessageRouter(), router_wait, tests, args.messages)
+
+        print(f"{tests:,} concurrent tests:")
+        print(f"  predicates: {predicate_time * 1e6:.2f}us per message")
+        print(f"  router:     {router_time * 1e6:.2f}us per message")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
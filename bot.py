@@ -1,10 +1,12 @@
 import asyncio
 import importlib
 import inspect
+import json
 import pkgutil
 import time
 import traceback
-from collections import Counter
+import uuid
+from collections import defaultdict
 from io import BytesIO
 from typing import TYPE_CHECKING, Union
 
@@ -15,32 +17,82 @@ from discord.ext import bridge, commands
 
 import cogs
 import config
+import helpers.metrics as metrics
+import helpers.tracing as tracing
 from data.constants import (
     DONATION_LINK,
     ERROR_CLR,
     GITHUB_LINK,
     LB_DISPLAY_AMT,
     LB_LENGTH,
+    LB_PAGE_CACHE_TIME,
+    LB_REBUILD_BATCH,
+    LB_STAGING_EXPIRE_TIME,
+    LEADER_LEASE_TIME,
     PERMISSONS,
     PRIMARY_CLR,
     PRIVACY_POLICY_LINK,
     RULES_LINK,
+    SPAM_STRIKE_EXPIRE_TIME,
     SUPPORT_SERVER_INVITE,
     TEST_EXPIRE_TIME,
     TEST_ZONES,
+    UPDATE_24_HOUR_INTERVAL,
 )
+from helpers.aggregation import FieldAggregation, Rolling24hAggregation
 from helpers.errors import OnGoingTest
+from helpers.percentiles import PercentileSketch
+from helpers.shared import Lease, LeaseLost, SharedExpiringMap, SharedRateLimit
 from helpers.ui import BaseView, CustomEmbed, create_link_view, get_log_embed
-from helpers.utils import get_hint, mention_command_from_name, message_banned_user
+from helpers.user import TOTAL_24H_INTERVALS, RollingStat, get_24h_interval
+from helpers.utils import (
+    LBUser,
+    get_hint,
+    get_users_from_lb,
+    mention_command_from_name,
+    message_banned_user,
+)
+from helpers.webhooks import LogShipper
 
 if TYPE_CHECKING:
     from cogs.utils.logging import Logging
     from cogs.utils.mongo import Mongo, User
     from cogs.utils.redis import Redis
+    from cogs.utils.router import Router
+
+
+# Buckets are kept for the whole window plus the interval that is being written to
+BUCKET_EXPIRE_TIME = (TOTAL_24H_INTERVALS + 1) * UPDATE_24_HOUR_INTERVAL * 60
+
+# Webhooks whose logs are sent in batches (error logs are sent straight away with a file)
+LOG_WEBHOOKS = ("cmd_wh", "test_wh", "impt_wh", "guild_wh")
+
+# Fenced by the lease (see Lease.run_fenced)
+# Swaps the staging leaderboard in, the ttl of the staging key isn't kept
+SWAP_LB_SCRIPT = """
+if ARGV[2] == "1" then
+    redis.call("RENAME", KEYS[2], KEYS[3])
+    redis.call("PERSIST", KEYS[3])
+else
+    redis.call("DEL", KEYS[2], KEYS[3])
+end
+
+return redis.call("INCR", KEYS[4])
+"""
+
+# Rebuilds the leaderboard from the buckets in KEYS[5:], trims it to ARGV[2]
+# and marks the interval as refreshed for ARGV[3] seconds
+UNION_LB_SCRIPT = """
+redis.call("ZUNIONSTORE", KEYS[2], #KEYS - 4, unpack(KEYS, 5))
+redis.call("ZREMRANGEBYRANK", KEYS[2], 0, -tonumber(ARGV[2]) - 1)
+redis.call("SET", KEYS[4], 1, "EX", ARGV[3])
+
+return redis.call("INCR", KEYS[3])
+"""
 
 
 class LBCategory:
-    def __init__(self, parent_index, index, bot, name, unit, get_stat):
+    def __init__(self, parent_index, index, bot, name, unit, get_stat, aggregation):
         self.parent_index = parent_index
         self.index = index
 
@@ -50,10 +102,74 @@ class LBCategory:
 
         self.get_stat = get_stat
 
+        # Computes the same stat as get_stat inside the database
+        self.aggregation = aggregation
+
+    @property
+    def field(self):
+        """Field of the user that the stat is read from"""
+        return self.aggregation.field.split(".")[0]
+
     @property
     def lb_key(self):
         return f"lb.{self.parent_index}.{self.index}"
 
+    def get_staging_key(self, token: int):
+        # Each leader writes to its own staging key
+        return f"{self.lb_key}.staging.{token}"
+
+    @property
+    def version_key(self):
+        return f"{self.lb_key}.version"
+
+    async def get_version(self):
+        version = await self.bot.redis.get(self.version_key)
+
+        return 0 if version is None else int(version)
+
+    async def rebuild(self, values: list[tuple[int, float]], token: int):
+        """
+        Rebuilds the leaderboard in a staging key and swaps it in atomically
+
+        The swap only happens while the lease is held with the token
+        """
+        staging_key = self.get_staging_key(token)
+
+        await self.bot.redis.delete(staging_key)
+
+        # Writing the new leaderboard in batches so that no single command is too large
+        async with self.bot.redis.pipeline(transaction=False) as pipe:
+            for i in range(0, len(values), LB_REBUILD_BATCH):
+                pipe.zadd(staging_key, dict(values[i : i + LB_REBUILD_BATCH]))
+
+            pipe.expire(staging_key, LB_STAGING_EXPIRE_TIME)
+
+            await pipe.execute()
+
+        # Swapping the staging leaderboard with the live one and stamping the new version
+        try:
+            return await self.bot.leader.run_fenced(
+                token,
+                SWAP_LB_SCRIPT,
+                [staging_key, self.lb_key, self.version_key],
+                [int(bool(values))],
+            )
+        except LeaseLost:
+            await self.bot.redis.delete(staging_key)
+            raise
+
+    async def get_top_values(self):
+        """Computes the top of the leaderboard from the database"""
+        cursor = self.bot.mongo.db.users.aggregate(self.aggregation.pipeline())
+
+        return [(u["_id"], u.get("value", 0)) async for u in cursor]
+
+    async def update(self, token: int):
+        values = await self.get_top_values()
+
+        # Replacing the live leaderboard without exposing a partial one
+        await self.rebuild(values, token)
+
     async def get_placing(self, user_id):
         placing = await self.bot.redis.zrevrank(self.lb_key, user_id)
 
@@ -62,8 +178,8 @@ class LBCategory:
 
         return placing
 
-    async def remove_user(self, user_id):
-        return await self.bot.redis.zrem(self.lb_key, user_id)
+    def queue_remove_user(self, pipe, user_id):
+        pipe.zrem(self.lb_key, user_id)
 
     def get_initial_value(self, ctx: "Context"):
         return ctx.initial_values[self.parent_index][self.index]
@@ -73,14 +189,74 @@ class LBCategory:
 
         return {int(u.decode()): v for u, v in raw_data}
 
-    async def get_lb_values_from_score(self, min, max):
-        raw_data = await self.bot.redis.zrevrangebyscore(
-            self.lb_key, min=min, max=max, withscores=True
-        )
+    @property
+    def page_key(self):
+        return f"{self.lb_key}.page"
+
+    async def get_lb_rows(self):
+        """
+        Gets the displayed rows of the leaderboard with the users resolved
+
+        Rows are cached in redis for every process until the leaderboard is rebuilt
+        """
+        version, raw_page = await self.bot.redis.mget(self.version_key, self.page_key)
+
+        version = 0 if version is None else int(version)
 
-        _, values = zip(*raw_data)
+        if raw_page is not None:
+            page = json.loads(raw_page)
 
-        return list(values)
+            if page["version"] == version:
+                rows = [(LBUser(_id, name), v) for _id, name, v in page["rows"]]
+
+                return rows, version
+
+        raw_lb_data = await self.get_lb_data()
+
+        lb = await get_users_from_lb(self.bot, raw_lb_data)
+
+        rows = [(LBUser(u.id, u.display_name), v) for u, v in lb]
+
+        page = {"version": version, "rows": [[*u, v] for u, v in rows]}
+
+        await self.bot.redis.set(self.page_key, json.dumps(page), ex=LB_PAGE_CACHE_TIME)
+
+        return rows, version
+
+    async def estimate_placing(self, old_value, new_value):
+        """
+        Estimates the new placing of a user from their old and new value
+
+        Same result as helpers.utils.estimate_placing on the values above the old value,
+        but only the counts are transferred
+        """
+        async with self.bot.redis_batch("estimate_placing") as batch:
+            batch.zcount(self.lb_key, old_value, "+inf")
+            batch.zcount(self.lb_key, old_value, new_value)
+            batch.zcount(self.lb_key, f"({new_value}", "+inf")
+            batch.zcount(self.lb_key, old_value, old_value)
+            batch.zcount(self.lb_key, f"({old_value}", new_value)
+
+        total, reached, above, at_old, passed = batch.results
+
+        if total == 0:
+            return 1, 1
+
+        # Checking if the new value is in the leaderboard
+        if new_value <= old_value or reached == 0:
+            return None
+
+        potential_placing = above + 1
+
+        if potential_placing > LB_LENGTH:
+            return None
+
+        # Checking if the user was previously on the leaderboard
+        if at_old == 0:
+            return potential_placing, None
+
+        # A difference of False means that the placing is the same
+        return potential_placing, passed or False
 
     @classmethod
     def new(cls, *args, **kwargs):
@@ -90,6 +266,111 @@ class LBCategory:
         return do_it
 
 
+class RollingLBCategory(LBCategory):
+    """
+    Leaderboard category for a rolling 24 hour stat
+
+    Each test increments a sorted set for the current interval and the live leaderboard,
+    the live leaderboard is rebuilt from the buckets in the window once per interval
+    """
+
+    @staticmethod
+    def get_interval():
+        return get_24h_interval()
+
+    def bucket_key(self, interval: int):
+        return f"{self.lb_key}.bucket.{interval}"
+
+    def refreshed_key(self, interval: int):
+        return f"{self.lb_key}.refreshed.{interval}"
+
+    @property
+    def seeded_key(self):
+        return f"{self.lb_key}.seeded"
+
+    def get_window(self, interval: int):
+        return [
+            self.bucket_key(i)
+            for i in range(interval - TOTAL_24H_INTERVALS + 1, interval + 1)
+        ]
+
+    def queue_increment(self, pipe, user_id, amount):
+        """Pipe should be a transaction so that a refresh can't land between the increments"""
+        bucket = self.bucket_key(self.get_interval())
+
+        pipe.zincrby(bucket, amount, user_id)
+        pipe.expire(bucket, BUCKET_EXPIRE_TIME)
+        pipe.zincrby(self.lb_key, amount, user_id)
+
+    def queue_remove_user(self, pipe, user_id):
+        super().queue_remove_user(pipe, user_id)
+
+        # Removing from the buckets as well so the next refresh doesn't add the user back
+        for bucket in self.get_window(self.get_interval()):
+            pipe.zrem(bucket, user_id)
+
+    async def seed(self, interval: int):
+        """Fills the buckets of the window from the database when there are no buckets yet"""
+        cursor = self.bot.mongo.db.users.aggregate(
+            self.aggregation.pipeline(include_ring=True)
+        )
+
+        start = interval - TOTAL_24H_INTERVALS + 1
+
+        # Each interval only gets what was added in it, so that old activity still leaves the window
+        buckets = defaultdict(dict)  # interval: {user_id: amount}
+
+        async for u in cursor:
+            amounts = RollingStat(u["ring"]).get_amounts(start)
+
+            for i, amount in amounts.items():
+                buckets[min(i, interval)][u["_id"]] = amount
+
+        if not buckets:
+            return
+
+        async with self.bot.redis.pipeline(transaction=False) as pipe:
+            for i, amounts in buckets.items():
+                bucket = self.bucket_key(i)
+                values = list(amounts.items())
+
+                for j in range(0, len(values), LB_REBUILD_BATCH):
+                    pipe.zadd(bucket, dict(values[j : j + LB_REBUILD_BATCH]))
+
+                pipe.expire(bucket, BUCKET_EXPIRE_TIME)
+
+            await pipe.execute()
+
+    async def refresh(self, token: int):
+        interval = self.get_interval()
+
+        # Only rebuilding once per interval, the interval is marked as refreshed with the union
+        # so that a refresh stopped by a lost lease is done again by the next leader
+        if await self.bot.redis.exists(self.refreshed_key(interval)):
+            return
+
+        if not await self.bot.redis.exists(self.seeded_key):
+            await self.seed(interval)
+
+            await self.bot.redis.set(self.seeded_key, 1)
+
+        # Trimmed to the same length as the other leaderboards
+        await self.bot.leader.run_fenced(
+            token,
+            UNION_LB_SCRIPT,
+            [
+                self.lb_key,
+                self.version_key,
+                self.refreshed_key(interval),
+                *self.get_window(interval),
+            ],
+            [LB_LENGTH, UPDATE_24_HOUR_INTERVAL * 60],
+        )
+
+    async def update(self, token: int):
+        await self.refresh(token)
+
+
 class Leaderboard:
     def __init__(
         self,
@@ -334,6 +615,7 @@ class CustomContextItems:
     def add_leaderboard_values(self):
         self.initial_values = self.bot.get_leaderboard_values(self.initial_user)
 
+    @tracing.traced()
     async def add_initial_stats(self, user):
         # Getting the initial user
         self.initial_user = await self.bot.mongo.fetch_user(user)
@@ -384,7 +666,15 @@ Context = Union[CustomPrefixContext, CustomAppContext]
 
 
 class WordPractice(bridge.AutoShardedBot):
-    def __init__(self, **kwargs):
+    def __init__(self, *, cluster_id: int = 0, cluster_count: int = 1, **kwargs):
+        # Which of the processes this is when running as a cluster
+        self.cluster_id = cluster_id
+        self.cluster_count = cluster_count
+
+        # Only the cluster holding the lease runs the background tasks
+        self.leader = Lease(
+            self, "tasks", f"{cluster_id}-{uuid.uuid4().hex}", LEADER_LEASE_TIME
+        )
 
         self.loop = asyncio.new_event_loop()
         asyncio.set_event_loop(self.loop)
@@ -407,25 +697,38 @@ class WordPractice(bridge.AutoShardedBot):
         self.activity = discord.Activity(type=discord.ActivityType.watching, name=name)
         self.session = aiohttp.ClientSession(loop=self.loop)
 
-        self.cooldowns = {}
+        # (user_id, command): expire timestamp, shared between processes through redis
+        # Cooldowns are never removed early, so other processes' values can be cached
+        self.cooldowns = SharedExpiringMap(self, "cooldown", cache_remote=True)
 
         # Cache
-        self.cmds_run = {}  # user_id: set{cmds}
+        self.cmds_run = {}  # user_id: set{cmds}, local copy of the sets in redis
         self.avg_perc = []  # [wpm (33% 66%), raw, acc]
 
+        # Live distribution of the typing averages that avg_perc is read from
+        self.avg_sketches = [
+            PercentileSketch("wpm", 1),
+            PercentileSketch("raw", 1),
+            PercentileSketch("acc", 0.5),
+        ]
+
         # Not using MaxConcurrency because it's based on context so it doesn't work with users who join race
-        self.active_tests = {}  # user_id: timestamp
+        self.active_tests = SharedExpiringMap(
+            self, "active"
+        )  # user_id: expire timestamp
 
-        self.spam_control = commands.CooldownMapping.from_cooldown(
-            6, 8, commands.BucketType.user  # rate, per
+        self.spam_control = SharedRateLimit(
+            self, "spam", rate=6, per=8, strike_expire=SPAM_STRIKE_EXPIRE_TIME
         )
-        self.spam_count = Counter()
 
         # Leaderboards
 
         def get_hs(s):
             return lambda u: u.highspeed[s].wpm
 
+        def get_hs_aggregation(s):
+            return FieldAggregation(f"highspeed.{s}.wpm")
+
         async def season_check(ctx: Context):
             season_data = await ctx.bot.mongo.get_season_info()
 
@@ -435,14 +738,26 @@ class WordPractice(bridge.AutoShardedBot):
             Leaderboard.new(
                 title="All Time",
                 emoji="\N{EARTH GLOBE AMERICAS}",
-                stats=[LBCategory.new(self, "Words Typed", "words", lambda u: u.words)],
+                stats=[
+                    LBCategory.new(
+                        self,
+                        "Words Typed",
+                        "words",
+                        lambda u: u.words,
+                        FieldAggregation("words"),
+                    )
+                ],
                 default=0,
                 priority=1,
             ),
             Leaderboard.new(
                 title="Monthly Season",
                 emoji="\N{SPORTS MEDAL}",
-                stats=[LBCategory.new(self, "Experience", "xp", lambda u: u.xp)],
+                stats=[
+                    LBCategory.new(
+                        self, "Experience", "xp", lambda u: u.xp, FieldAggregation("xp")
+                    )
+                ],
                 default=0,
                 check=season_check,
                 priority=2,
@@ -451,9 +766,19 @@ class WordPractice(bridge.AutoShardedBot):
                 title="24 Hour",
                 emoji="\N{CLOCK FACE ONE OCLOCK}",
                 stats=[
-                    LBCategory.new(self, "Experience", "xp", lambda u: sum(u.xp_24h)),
-                    LBCategory.new(
-                        self, "Words Typed", "words", lambda u: sum(u.words_24h)
+                    RollingLBCategory.new(
+                        self,
+                        "Experience",
+                        "xp",
+                        lambda u: u.xp_24h.sum,
+                        Rolling24hAggregation("ring_xp_24h"),
+                    ),
+                    RollingLBCategory.new(
+                        self,
+                        "Words Typed",
+                        "words",
+                        lambda u: u.words_24h.sum,
+                        Rolling24hAggregation("ring_words_24h"),
                     ),
                 ],
                 default=0,
@@ -462,7 +787,9 @@ class WordPractice(bridge.AutoShardedBot):
                 title="High Score",
                 emoji="\N{RUNNER}",
                 stats=[
-                    LBCategory.new(self, s.capitalize(), "wpm", get_hs(s))
+                    LBCategory.new(
+                        self, s.capitalize(), "wpm", get_hs(s), get_hs_aggregation(s)
+                    )
                     for s in TEST_ZONES.keys()
                 ],
                 default=1,
@@ -479,7 +806,16 @@ class WordPractice(bridge.AutoShardedBot):
         for i, lb in enumerate(self.lbs):
             self.lbs[i] = lb(i)
 
+        # Changing any of these fields invalidates the leaderboard values of a user
+        self.lb_fields = frozenset(stat.field for lb in self.lbs for stat in lb.stats)
+
     def get_leaderboard_values(self, user):
+        # The 24 hour stats change when their window moves even if the user doesn't
+        interval = get_24h_interval()
+
+        if user.lb_snapshot is not None and user.lb_snapshot[0] == interval:
+            return user.lb_snapshot[1]
+
         values = []
 
         for lb in self.lbs:
@@ -490,20 +826,19 @@ class WordPractice(bridge.AutoShardedBot):
 
             values.append(category)
 
+        user.lb_snapshot = (interval, values)
+
         return values
 
-    def active_start(self, user_id: int):
-        timestamp = self.active_tests.get(user_id, None)
+    async def active_start(self, user_id: int):
+        expire_time = time.time() + TEST_EXPIRE_TIME + 1
 
-        # Checking if the user is in an active test and it isn't expired
-        if timestamp is not None and time.time() - timestamp < TEST_EXPIRE_TIME + 1:
+        # Checking if the user is in an active test that isn't expired
+        if await self.active_tests.add(user_id, expire_time) is not None:
             raise OnGoingTest()
 
-        self.active_tests[user_id] = time.time()
-
-    def active_end(self, user_id: int):
-        if user_id in self.active_tests:
-            del self.active_tests[user_id]
+    async def active_end(self, user_id: int):
+        await self.active_tests.remove(user_id)
 
     async def handle_after_welcome_check(self, ctx: Context):
         # Checking if the user is banned
@@ -528,6 +863,13 @@ class WordPractice(bridge.AutoShardedBot):
     def redis(self) -> "Redis":
         return self.get_cog("Redis").pool
 
+    @property
+    def router(self) -> "Router":
+        return self.get_cog("Router")
+
+    def redis_batch(self, name: str, *, transaction: bool = False):
+        return self.get_cog("Redis").batch(name, transaction=transaction)
+
     @property
     def log(self) -> "Logging":
         return self.get_cog("Logging").log
@@ -543,8 +885,32 @@ class WordPractice(bridge.AutoShardedBot):
     def custom_embed(self, **kwargs):
         return CustomEmbed(self, **kwargs)
 
+    def get_local_cluster_stats(self):
+        """Guild and shard count of this cluster"""
+        return len(self.guilds), len(self.shards)
+
+    async def get_cluster_stats(self):
+        """Guild and shard count of every cluster"""
+        others = [i for i in range(self.cluster_count) if i != self.cluster_id]
+
+        # This cluster is counted locally, its entry might not be published yet or have expired
+        guilds, shards = self.get_local_cluster_stats()
+
+        if not others:
+            return guilds, shards
+
+        async with self.redis_batch("cluster_stats") as batch:
+            for i in others:
+                batch.hmget(f"cluster.{i}", "guilds", "shards")
+
+        for g, s in batch.results:
+            guilds += int(g or 0)
+            shards += int(s or 0)
+
+        return guilds, shards
+
     async def on_shard_ready(self, shard_id):
-        self.log.info(f"Shard {shard_id} ready")
+        self.log.info(f"Shard {shard_id} ready (cluster {self.cluster_id})")
 
     async def get_application_context(self, interaction, cls=CustomAppContext):
         ctx = await super().get_application_context(interaction, cls)
@@ -621,6 +987,17 @@ class WordPractice(bridge.AutoShardedBot):
         return False
 
     async def on_interaction(self, interaction):
+        if interaction.type is InteractionType.application_command:
+            name = interaction.data.get("name")
+        else:
+            name = interaction.type.name
+
+        with metrics.COMMAND_TIME.time("interaction", name), tracing.trace(
+            name, type="interaction", user=interaction.user.id
+        ):
+            await self.handle_interaction(interaction)
+
+    async def handle_interaction(self, interaction):
         if interaction.type is InteractionType.application_command:
 
             ctx = await self.get_application_context(interaction)
@@ -651,7 +1028,12 @@ class WordPractice(bridge.AutoShardedBot):
         if ctx is None:
             return
 
-        if ctx.command is not None:
+        if ctx.command is None:
+            return await self.invoke(ctx)
+
+        with metrics.COMMAND_TIME.time(
+            "prefix", ctx.command.qualified_name
+        ), tracing.trace(ctx.command.qualified_name, type="prefix", user=ctx.author.id):
             if await self.check_dm_cmd(ctx):
                 return
 
@@ -668,18 +1050,13 @@ class WordPractice(bridge.AutoShardedBot):
 
             # Spam control
             # https://github.com/Rapptz/RoboDanny/blob/rewrite/bot.py
-            bucket = self.spam_control.get_bucket(message)
-
-            current = message.created_at.replace().timestamp()
-            retry_after = bucket.update_rate_limit(current)
-
             author_id = message.author.id
 
-            if retry_after and author_id != self.owner_id:
-                self.spam_count[author_id] += 1
+            amt = await self.spam_control.hit(author_id)
 
-                if (amt := self.spam_count[author_id]) >= 3:
-                    del self.spam_count[author_id]
+            if amt and author_id != self.owner_id:
+                if amt >= 3:
+                    await self.spam_control.reset(author_id)
 
                     reason = "Spamming commands"
 
@@ -704,22 +1081,25 @@ class WordPractice(bridge.AutoShardedBot):
 
                     await self.impt_wh.send(embed=embed)
 
-            else:
-                self.spam_count.pop(author_id, None)
-
-        await self.invoke(ctx)
+            await self.invoke(ctx)
 
     @discord.utils.cached_property
     def cmd_wh(self):
-        return discord.Webhook.from_url(config.COMMAND_LOG, session=self.session)
+        webhook = discord.Webhook.from_url(config.COMMAND_LOG, session=self.session)
+
+        return LogShipper(webhook, "cmd")
 
     @discord.utils.cached_property
     def test_wh(self):
-        return discord.Webhook.from_url(config.TEST_LOG, session=self.session)
+        webhook = discord.Webhook.from_url(config.TEST_LOG, session=self.session)
+
+        return LogShipper(webhook, "test")
 
     @discord.utils.cached_property
     def impt_wh(self):
-        return discord.Webhook.from_url(config.IMPORTANT_LOG, session=self.session)
+        webhook = discord.Webhook.from_url(config.IMPORTANT_LOG, session=self.session)
+
+        return LogShipper(webhook, "impt")
 
     @discord.utils.cached_property
     def error_wh(self):
@@ -727,7 +1107,9 @@ class WordPractice(bridge.AutoShardedBot):
 
     @discord.utils.cached_property
     def guild_wh(self):
-        return discord.Webhook.from_url(config.GUILD_LOG, session=self.session)
+        webhook = discord.Webhook.from_url(config.GUILD_LOG, session=self.session)
+
+        return LogShipper(webhook, "guild")
 
     async def on_ready(self):
         self.log.info("The bot is ready!")
@@ -735,6 +1117,14 @@ class WordPractice(bridge.AutoShardedBot):
     async def close(self):
         await super().close()
 
+        # Letting another cluster take over the background tasks straight away
+        await self.leader.release()
+
+        # Sending the logs that are still queued
+        for name in LOG_WEBHOOKS:
+            if (shipper := self.__dict__.get(name)) is not None:
+                await shipper.close()
+
         await self.session.close()
         await self.redis.close()
 
@@ -1,10 +1,13 @@
-from typing import TYPE_CHECKING
+from collections import defaultdict
+from typing import TYPE_CHECKING, NamedTuple, Optional
 
 import data.icons as icons
 from bot import Context
+from helpers.user import get_user_cmds_run
 from helpers.utils import get_bar
 
 from .badges import badges
+from .base import Achievement, Category
 from .beginning import beginning
 from .endurance import endurance
 from .typing import typing
@@ -20,33 +23,115 @@ categories = {
 }
 
 
-def user_has_complete(all_names, i, name, user: "User"):
-    a_count = all_names[: i + 1].count(name)
+# How the fields are compared between checks, other fields are compared by value
+FIELD_INPUTS = {
+    "scores": lambda ctx, u: (
+        len(u.scores),
+        u.scores[-1].timestamp if u.scores else None,
+    ),
+    "highspeed": lambda ctx, u: tuple(s.wpm for s in u.highspeed.values()),
+    "cmds_run": lambda ctx, u: len(get_user_cmds_run(ctx.bot, u)),
+}
+
+
+def _get_field_input(ctx: Context, user: "User", field: str):
+    if (get_input := FIELD_INPUTS.get(field)) is not None:
+        return get_input(ctx, user)
+
+    value = user[field]
+
+    return tuple(value) if isinstance(value, list) else value
+
+
+class IndexedAchievement(NamedTuple):
+    achievement: Achievement
+
+    # Times the name has to be in the user's achievements for it to be complete
+    required: int
+
+    # Position in the challenge, None if the name is only used once
+    count: Optional[int]
+
+    category: Category
+    identifier: tuple[int, int]
+
+
+class AchievementIndex:
+    """Every achievement in order, indexed by the user fields that they depend on"""
+
+    def __init__(self, categories: dict):
+        self.entries = []
+
+        for iii, cv in enumerate(categories.values()):
+            for ii, c in enumerate(cv.challenges):
+                a = sum(c, []) if isinstance(c, list) else [c]
+
+                all_names = [b.name for b in a]
+
+                for i, n in enumerate(a):
+                    self.entries.append(
+                        IndexedAchievement(
+                            n,
+                            all_names[: i + 1].count(n.name),
+                            i if all_names.count(n.name) > 1 else None,
+                            cv,
+                            (iii, ii),
+                        )
+                    )
+
+        # Positions of the entries
+        self.by_field = defaultdict(list)
+        self.by_name = defaultdict(list)
+        self.always = []
+
+        for pos, e in enumerate(self.entries):
+            self.by_name[e.achievement.name].append(pos)
+
+            if e.achievement.depends_on is None:
+                self.always.append(pos)
+            else:
+                for field in e.achievement.depends_on:
+                    self.by_field[field].append(pos)
+
+    def get_inputs(self, ctx: Context, user: "User"):
+        """Values of the fields that the achievements depend on, for finding what changed"""
+        return {field: _get_field_input(ctx, user, field) for field in self.by_field}
+
+    def get_entries(self, changed: set = None, names: list = ()):
+        """Entries that could have been completed, changed: None checks every entry"""
+        if changed is None:
+            return self.entries
+
+        positions = set(self.always)
+
+        for field in changed:
+            positions.update(self.by_field.get(field, ()))
+
+        for name in names:
+            positions.update(self.by_name.get(name, ()))
 
-    return a_count <= len(user.achievements.get(name, []))
+        return [self.entries[p] for p in sorted(positions)]
 
 
-async def check_achievements(ctx: Context, user: "User"):
-    for iii, cv in enumerate(categories.values()):
-        for ii, c in enumerate(cv.challenges):
-            a = sum(c, []) if isinstance(c, list) else [c]
+achievement_index = AchievementIndex(categories)
 
-            all_names = [b.name for b in a]
 
-            for i, n in enumerate(a):
+async def check_achievements(ctx: Context, user: "User", changed: set = None):
+    """
+    Yields the achievements that the user has completed
 
-                # checking if the user has already completed the achievement
-                if user_has_complete(all_names, i, n.name, user):
-                    continue
+    changed: user fields that changed since the achievements were last checked (None checks all)
+    """
+    for e in achievement_index.get_entries(changed, ctx.achievements_completed):
+        a = e.achievement
 
-                if (
-                    await n.is_completed(ctx, user)
-                    or n.name in ctx.achievements_completed
-                ):
-                    # achievement object, count of achievement, identifer
-                    yield n, i if all_names.count(n.name) > 1 else None, cv, (iii, ii)
+        # checking if the user has already completed the achievement
+        if e.required <= len(user.achievements.get(a.name, [])):
+            continue
 
-                continue
+        if a.name in ctx.achievements_completed or await a.is_completed(ctx, user):
+            # achievement object, count of achievement, category, identifer
+            yield a, e.count, e.category, e.identifier
 
 
 def is_a_done(a, user: "User"):
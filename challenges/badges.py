@@ -6,6 +6,8 @@ from .rewards import BadgeReward
 
 
 class Badges(Achievement):
+    depends_on = ("badges",)
+
     def __init__(self, name, amt):
         super().__init__(
             name=name,
@@ -19,6 +21,8 @@ class Badges(Achievement):
 
 
 class Collector(Achievement):
+    depends_on = ("badges",)
+
     def __init__(self):
         super().__init__(name="Collector", desc="Earn every badge in a season")
 
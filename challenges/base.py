@@ -5,8 +5,6 @@ Challenges:
 [[a,b,c], a, b] 
 """
 
-from itertools import groupby
-
 from PIL import Image
 
 
@@ -24,6 +22,10 @@ class Challenge:
 
 
 class Achievement(Challenge):
+    # User fields that the progress is calculated from, only achievements depending on a field
+    # that changed are checked after a command (None if it can change without the user changing)
+    depends_on = None
+
     def __init__(self, *, name: str, **kwargs):
         super().__init__(**kwargs)
 
@@ -51,15 +53,3 @@ class Category:
             return
 
         return self.reward.changer
-
-
-def get_in_row(scores, condition):
-    if scores == []:
-        return 0
-
-    result = [condition(s) for s in scores]
-
-    if result[-1] is False:
-        return 0
-
-    return [sum(i) for r, i in groupby(result) if r][-1]
@@ -11,6 +11,8 @@ from .rewards import BadgeReward
 
 
 class StartingOut(Achievement):
+    depends_on = ()
+
     def __init__(self):
         super().__init__(
             name="Starting out", desc="Use wordPractice for the first time"
@@ -21,6 +23,8 @@ class StartingOut(Achievement):
 
 
 class Quoi(Achievement):
+    depends_on = ("language",)
+
     def __init__(self):
         super().__init__(name="Quoi?", desc="Change your language settings")
 
@@ -29,6 +33,8 @@ class Quoi(Achievement):
 
 
 class Competition(Achievement):
+    depends_on = ("scores",)
+
     def __init__(self):
         super().__init__(
             name="Competition",
@@ -40,6 +46,8 @@ class Competition(Achievement):
 
 
 class Colours(Achievement):
+    depends_on = ("theme",)
+
     def __init__(self):
         super().__init__(
             name="Colours!",
@@ -51,6 +59,9 @@ class Colours(Achievement):
 
 
 class OpenMinded(Achievement):
+    # Also changes when a command is added to the commands run in the cache
+    depends_on = ("cmds_run",)
+
     def __init__(self):
         super().__init__(name="Open-minded", desc="Run every single __slash command__")
 
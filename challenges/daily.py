@@ -6,10 +6,9 @@ from functools import lru_cache
 
 from bot import Context
 from data.constants import CHALLENGE_AMT
-from helpers.user import get_daily_stat
 from helpers.utils import datetime_to_unix, get_start_of_day, is_today, weighted_lottery
 
-from .base import Challenge, get_in_row
+from .base import Challenge
 from .rewards import XPReward
 
 
@@ -21,7 +20,7 @@ class WordChallenge(Challenge):
         self.word_amt = word_amt
 
     async def progress(self, ctx: Context, user):
-        return get_daily_stat(user.words_24h), self.word_amt
+        return user.words_24h.today, self.word_amt
 
 
 class VoteChallenge(Challenge):
@@ -41,10 +40,7 @@ class AccuracyChallenge(Challenge):
         self.amt = amt
 
     async def progress(self, ctx: Context, user):
-        return (
-            get_in_row(user.scores, lambda s: s.acc == 100 and is_today(s.timestamp)),
-            self.amt,
-        )
+        return user.stats.today_acc_row, self.amt
 
 
 class QuoteChallenge(Challenge):
@@ -54,17 +50,7 @@ class QuoteChallenge(Challenge):
         self.amt = amt
 
     async def progress(self, ctx: Context, user):
-        if len(user.scores) == 0:
-            progress = 0
-        else:
-            progress = get_in_row(
-                user.scores, lambda s: s.test_type_int == 0 and is_today(s.timestamp)
-            )
-
-        return (
-            progress,
-            self.amt,
-        )
+        return user.stats.today_quote_row, self.amt
 
 
 @lru_cache(maxsize=1)
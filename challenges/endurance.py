@@ -14,6 +14,8 @@ class SingleStatEndurance(Achievement):
         self.key = key
         self.value = value
 
+        self.depends_on = (key,)
+
     async def progress(self, ctx: Context, user):
         return user[self.key], self.value
 
@@ -5,6 +5,9 @@ from static.badges import get_badge_from_id
 
 
 class Reward:
+    # User fields updated by the changer
+    changes = ()
+
     def __init__(self, desc):
         self.desc = desc
 
@@ -24,6 +27,8 @@ class Reward:
 
 
 class BadgeReward(Reward):
+    changes = ("badges",)
+
     def __init__(self, badge_id: str):
         self.badge_id = badge_id
 
@@ -60,6 +65,8 @@ class BadgeReward(Reward):
 class XPReward(Reward):
     template = f"{icons.xp}" "{} XP"
 
+    changes = ("xp", "ring_xp_24h")
+
     def __init__(self, amt: int):
         self.amt = amt
 
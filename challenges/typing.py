@@ -1,12 +1,14 @@
 from bot import Context
-from helpers.utils import calculate_score_consistency
+from data.constants import CONSISTENCY_AMT
 from static.assets import speed_icon
 
-from .base import Achievement, Category, get_in_row
+from .base import Achievement, Category
 from .rewards import BadgeReward
 
 
 class Speed(Achievement):
+    depends_on = ("highspeed",)
+
     def __init__(self, name, wpm):
         super().__init__(name=name, desc=f"Type {wpm} wpm")
 
@@ -17,6 +19,8 @@ class Speed(Achievement):
 
 
 class Perfectionist(Achievement):
+    depends_on = ("scores",)
+
     def __init__(self, amt):
         super().__init__(
             name="Perfectionist",
@@ -26,10 +30,12 @@ class Perfectionist(Achievement):
         self.amt = amt
 
     async def progress(self, ctx: Context, user):
-        return get_in_row(user.scores, lambda s: s.acc == 100), self.amt
+        return user.stats.acc_row, self.amt
 
 
 class Consistency(Achievement):
+    depends_on = ("scores",)
+
     def __init__(self):
         super().__init__(
             name="Consistency",
@@ -37,16 +43,18 @@ class Consistency(Achievement):
         )
 
     async def progress(self, ctx: Context, user):
+        stats = user.stats
+
         result = (
-            0
-            if len(user.scores) < 30
-            else calculate_score_consistency(user.scores[-30:])
+            0 if stats.amt < CONSISTENCY_AMT else stats.get_consistency(CONSISTENCY_AMT)
         )
 
         return result, 90
 
 
 class BeepBoop(Achievement):
+    depends_on = ("scores",)
+
     def __init__(self, amt):
         super().__init__(
             name="Beep Boop",
@@ -56,7 +64,7 @@ class BeepBoop(Achievement):
         self.amt = amt
 
     async def progress(self, ctx: Context, user):
-        return get_in_row(user.scores, lambda s: abs(s.wpm - 60) <= 1), self.amt
+        return user.stats.sixty_row, self.amt
 
 
 typing = Category(
@@ -0,0 +1,189 @@
+"""
+Runs the bot as several processes (clusters) that each connect a range of the shards
+
+Usage: python cluster.py
+"""
+
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+import urllib.request
+
+import config
+from data.constants import CLUSTER_RESTART_DELAY
+
+# Discord allows one shard to identify every 5 seconds
+IDENTIFY_DELAY = 5
+
+# A cluster that stays up this long is no longer considered crashing
+STABLE_TIME = 600
+
+log = logging.getLogger("cluster")
+
+
+def get_shard_count():
+    if config.SHARD_COUNT:
+        return config.SHARD_COUNT
+
+    request = urllib.request.Request(
+        "https://discord.com/api/v10/gateway/bot",
+        headers={"Authorization": f"Bot {config.BOT_TOKEN}"},
+    )
+
+    with urllib.request.urlopen(request) as resp:
+        return json.load(resp)["shards"]
+
+
+def split_shards(shard_count: int, cluster_count: int) -> list[list[int]]:
+    size, extra = divmod(shard_count, cluster_count)
+
+    clusters = []
+    start = 0
+
+    for i in range(cluster_count):
+        end = start + size + (i < extra)
+        clusters.append(list(range(start, end)))
+        start = end
+
+    return clusters
+
+
+def run_cluster(**kwargs):
+    # Imported in the child process so that the parent doesn't load the bot
+    from main import main
+
+    main(**kwargs)
+
+
+class Cluster:
+    def __init__(self, cluster_id: int, cluster_count: int, shard_ids, shard_count):
+        self.kwargs = {
+            "cluster_id": cluster_id,
+            "cluster_count": cluster_count,
+            "shard_ids": shard_ids,
+            "shard_count": shard_count,
+        }
+
+        self.process = None
+
+        self.started_at = None
+        self.restart_at = None
+
+        self.crashes = 0
+
+    @property
+    def name(self):
+        return f"Cluster {self.kwargs['cluster_id']}"
+
+    def start(self, ctx):
+        self.process = ctx.Process(
+            target=run_cluster, kwargs=self.kwargs, name=self.name, daemon=False
+        )
+        self.process.start()
+
+        self.started_at = time.monotonic()
+        self.restart_at = None
+
+        log.info(f"{self.name} started with shards {self.kwargs['shard_ids']}")
+
+    def check(self, ctx):
+        """Restarts the cluster if it has exited, waiting longer after each crash"""
+        now = time.monotonic()
+
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.start(ctx)
+
+            return
+
+        if self.process.is_alive():
+            if now - self.started_at >= STABLE_TIME:
+                self.crashes = 0
+
+            return
+
+        start, maximum = CLUSTER_RESTART_DELAY
+
+        delay = min(start * 2**self.crashes, maximum)
+
+        self.crashes += 1
+        self.restart_at = now + delay
+
+        log.warning(
+            f"{self.name} exited with code {self.process.exitcode}, restarting in {delay}s"
+        )
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+
+    def join(self, timeout: float):
+        if self.process is not None:
+            self.process.join(timeout)
+
+            if self.process.is_alive():
+                self.process.kill()
+
+
+class Supervisor:
+    def __init__(self, cluster_count: int):
+        self.ctx = multiprocessing.get_context("spawn")
+
+        shard_count = get_shard_count()
+        cluster_count = min(cluster_count, shard_count)
+
+        self.clusters = [
+            Cluster(i, cluster_count, shard_ids, shard_count)
+            for i, shard_ids in enumerate(split_shards(shard_count, cluster_count))
+        ]
+
+        self.running = True
+
+    def handle_signal(self, *_):
+        self.running = False
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+
+        # Staggering the clusters so that their shards don't identify at the same time
+        for c in self.clusters:
+            if self.running is False:
+                break
+
+            c.start(self.ctx)
+
+            time.sleep(len(c.kwargs["shard_ids"]) * IDENTIFY_DELAY)
+
+        while self.running:
+            for c in self.clusters:
+                c.check(self.ctx)
+
+            time.sleep(1)
+
+        log.info("Stopping clusters")
+
+        for c in self.clusters:
+            c.stop()
+
+        for c in self.clusters:
+            c.join(timeout=30)
+
+
+def main():
+    logging.basicConfig(
+        stream=sys.stdout,
+        level=logging.INFO,
+        format="[{asctime}] [{levelname}] {name}: {message}",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        style="{",
+    )
+
+    Supervisor(config.CLUSTER_COUNT).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -36,11 +36,9 @@ from helpers.converters import user_option
 from helpers.ui import BaseView, DictButton, ScrollView, ViewFromDict
 from helpers.user import get_pacer_display, get_theme_display, get_typing_average
 from helpers.utils import (
-    calculate_score_consistency,
     cmd_run_before,
     get_bar,
     get_lb_display,
-    get_users_from_lb,
 )
 
 if TYPE_CHECKING:
@@ -271,13 +269,13 @@ class SeasonView(ViewFromDict):
         # Getting the highest placing that will be displayed
         end = SEASON_TROPHY_DATA[-1][2][1]
 
-        raw_lb_data = await self.category.get_lb_data(end)
+        lb, _ = await self.category.get_lb_rows()
 
-        self.lb_data = await get_users_from_lb(self.ctx.bot, raw_lb_data)
+        self.lb_data = lb[:end]
 
         # Getting the placing of the author
         self.placing, self.lb_placing = await _get_lb_placing(
-            raw_lb_data, self.category, self.ctx.author.id
+            {u.id: v for u, v in self.lb_data}, self.category, self.ctx.author.id
         )
 
         return await super().start()
@@ -501,7 +499,7 @@ class LeaderboardView(ScrollView):
 
         self.timeout = 60
 
-        # Caches the data for each leaderboard {lb_key: (lb, placing, lb_placing)}
+        # Caches the data for each leaderboard {lb_key: (lb, placing, lb_placing, version)}
         self.lb_data = {}
 
         self.active_btns = []
@@ -536,20 +534,18 @@ class LeaderboardView(ScrollView):
             description=f"View another user's profile with `{self.ctx.prefix}profile name#discrim`",
         )
 
-        # Checking if the leaderboard data was cached
-        if self.c.lb_key in self.lb_data:
-            lb, placing, _ = self.lb_data[self.c.lb_key]
+        lb, version = await self.c.get_lb_rows()
 
-        else:
-            raw_lb_data = await self.c.get_lb_data()
-
-            lb = await get_users_from_lb(self.ctx.bot, raw_lb_data)
+        # Reusing the placing of the author if the leaderboard hasn't been rebuilt since
+        if (cached := self.lb_data.get(self.c.lb_key)) and cached[3] == version:
+            _, placing, lb_placing, _ = cached
 
+        else:
             placing, lb_placing = await _get_lb_placing(
-                raw_lb_data, self.c, self.ctx.author.id
+                {u.id: v for u, v in lb}, self.c, self.ctx.author.id
             )
 
-            self.lb_data[self.c.lb_key] = (lb, placing, lb_placing)
+        self.lb_data[self.c.lb_key] = (lb, placing, lb_placing, version)
 
         # Generating the leaderboard UI
         for i, (u, value) in enumerate(self.items):
@@ -788,7 +784,7 @@ class ProfileView(BaseView):
             f"{self.user.words:,}", 9 + in_between + sp_words
         )
         fr_xp = self.format_account_stat(f"{self.user.xp:,}", 14 + in_between + sp_xp)
-        fr_24_xp = f"{sum(self.user.xp_24h):,}"
+        fr_24_xp = f"{self.user.xp_24h.sum:,}"
 
         if self.user.badges == []:
             badges = "User has no badges..."
@@ -896,7 +892,7 @@ class ProfileView(BaseView):
 
         wpm, raw, acc, cw, tw, scores = get_typing_average(self.user)
 
-        con = calculate_score_consistency(scores)
+        con = self.user.stats.get_consistency()
 
         # Average
 
@@ -10,14 +10,26 @@ from discord.ext.commands import errors
 from rapidfuzz import fuzz, process
 
 import data.icons as icons
-from bot import Context, WordPractice
-from challenges.achievements import check_achievements, check_categories
+import helpers.tracing as tracing
+from bot import Context, RollingLBCategory, WordPractice
+from challenges.achievements import (
+    achievement_index,
+    check_achievements,
+    check_categories,
+)
 from challenges.daily import get_daily_challenges
 from challenges.rewards import group_rewards
 from challenges.season import check_season_rewards
-from data.constants import ACHIEVEMENTS_SHOWN, DONATION_LINK, SUPPORT_SERVER_INVITE
+from data.constants import (
+    ACHIEVEMENT_INPUTS_AMT,
+    ACHIEVEMENTS_SHOWN,
+    CMDS_RUN_EXPIRE_TIME,
+    DONATION_LINK,
+    SUPPORT_SERVER_INVITE,
+)
 from helpers.errors import ImproperArgument, OnGoingTest
 from helpers.image import generate_achievement_image
+from helpers.percentiles import get_sketch_averages
 from helpers.ui import BaseView, create_link_view, get_log_embed
 from helpers.user import get_user_cmds_run
 from helpers.utils import filter_commands, format_command, get_command_name
@@ -45,29 +57,80 @@ SEASON_PLACING_TIERS = (
 
 async def _update_placings(ctx: Context, user):
     update = {}
+    increments = {}
+
+    # Amount that each stat changed by {(category, stat): amount}
+    changes = {}
 
     values = ctx.bot.get_leaderboard_values(user)
 
-    for i, (lb, s_lb) in enumerate(zip(values, ctx.initial_values)):
-        for n, (stat, s_stat) in enumerate(zip(lb, s_lb)):
-            if stat != s_stat:
-                update[f"lb.{i}.{n}"] = stat
+    for lb, lb_values, s_lb_values in zip(ctx.bot.lbs, values, ctx.initial_values):
+        for c, stat, s_stat in zip(lb.stats, lb_values, s_lb_values):
+            if stat == s_stat:
+                continue
+
+            if isinstance(c, RollingLBCategory):
+                # Recalculating the initial value so that a shift in the window isn't counted
+                initial = ctx.bot.get_leaderboard_values(ctx.initial_user)
+
+                amount = stat - initial[c.parent_index][c.index]
+
+                if amount <= 0:
+                    continue
+
+                increments[c] = amount
+
+            else:
+                amount = stat - s_stat
+
+                update[c.lb_key] = stat
+
+            changes[(c.parent_index, c.index)] = amount
 
-    if not update:
+    if not update and not increments:
         return None, None
 
-    # Getting the current season placing of the user
-    start_placing = await ctx.bot.redis.zrevrank("lb.1.0", user.id)
+    tournaments = await ctx.bot.mongo.get_active_activity_tournaments()
+
+    async with ctx.bot.redis_batch("update_placings", transaction=True) as batch:
+        # Getting the current season placing of the user
+        batch.zrevrank("lb.1.0", user.id)
+
+        # Updating the user's placing
+        for name, value in update.items():
+            batch.zadd(name, {user.id: value})
+
+        for c, amount in increments.items():
+            c.queue_increment(batch, user.id, amount)
 
-    # Updating the user's placing
-    for name, value in update.items():
-        await ctx.bot.redis.zadd(name, {user.id: value})
+        # Updating the standings of the tournaments that track a changed stat
+        for t in tournaments:
+            if amount := changes.get((t.category, t.stat)):
+                batch.zincrby(t.rankings_key, amount, user.id)
 
-    after_placing = await ctx.bot.redis.zrevrank("lb.1.0", user.id)
+        batch.zrevrank("lb.1.0", user.id)
+
+    start_placing, *_, after_placing = batch.results
 
     return start_placing, after_placing
 
 
+async def _update_percentiles(ctx: Context, user):
+    old = get_sketch_averages(ctx.initial_user)
+    new = get_sketch_averages(user)
+
+    if old == new:
+        return
+
+    async with ctx.bot.redis_batch("update_percentiles") as batch:
+        for i, sketch in enumerate(ctx.bot.avg_sketches):
+            sketch.queue_move(
+                batch,
+                None if old is None else old[i],
+                None if new is None else new[i],
+            )
+
+
 def _get_tier_index(placing) -> tuple[int, int]:
     return next(
         (
@@ -130,6 +193,27 @@ class Events(commands.Cog):
             1, 60 * 6, commands.BucketType.user
         )
 
+        # user_id: inputs of the achievements when they were last checked (least recent first)
+        self.achievement_inputs = {}
+
+    def get_changed_inputs(self, ctx: Context, user):
+        """Achievement inputs that changed since they were last checked, None if they weren't checked"""
+        last = self.achievement_inputs.get(user.id)
+
+        if last is None:
+            return None
+
+        inputs = achievement_index.get_inputs(ctx, user)
+
+        return {field for field, value in inputs.items() if last[field] != value}
+
+    def save_achievement_inputs(self, ctx: Context, user):
+        self.achievement_inputs.pop(user.id, None)
+        self.achievement_inputs[user.id] = achievement_index.get_inputs(ctx, user)
+
+        if len(self.achievement_inputs) > ACHIEVEMENT_INPUTS_AMT:
+            del self.achievement_inputs[next(iter(self.achievement_inputs))]
+
     async def log_interaction(self, ctx: Context):
         # Logging the interaction
 
@@ -192,12 +276,12 @@ class Events(commands.Cog):
             if isinstance(error, errors.BotMissingPermissions):
                 return await self.handle_check_failure(ctx, error)
 
-            return self.bot.active_end(ctx.author.id)
+            return await self.bot.active_end(ctx.author.id)
 
         if isinstance(error, OnGoingTest):
             return await self.bot.handle_ongoing_test_error(ctx.respond)
 
-        self.bot.active_end(ctx.author.id)
+        await self.bot.active_end(ctx.author.id)
 
         if isinstance(error, errors.UserInputError):
             return await self.handle_user_input_error(ctx, error)
@@ -249,7 +333,7 @@ class Events(commands.Cog):
         elif isinstance(error, errors.MissingPermissions):
             await self.send_basic_error(ctx, title="You can't do that", severe=True)
 
-        return self.bot.active_end(ctx.author.id)
+        return await self.bot.active_end(ctx.author.id)
 
     async def handle_user_input_error(self, ctx: Context, error):
         if isinstance(error, errors.BadArgument):
@@ -342,13 +426,14 @@ class Events(commands.Cog):
     async def on_command_completion(self, ctx: Context):
         await self.handle_command_completion(ctx)
 
+    @tracing.traced()
     async def handle_command_completion(self, ctx: Context):
         if ctx.no_completion:
             return
 
         user = await self.bot.mongo.fetch_user(ctx.author, create=True)
 
-        await self.bot.redis.hdel("user", user.id)
+        await self.bot.mongo.invalidate_users(user.id)
 
         new_user = copy.deepcopy(user)
 
@@ -376,14 +461,23 @@ class Events(commands.Cog):
         cmds = get_user_cmds_run(self.bot, new_user)
 
         if cmd_name not in cmds:
-            new_cache_cmds = self.bot.cmds_run.get(ctx.author.id, set()) | {cmd_name}
+            # Commands run in other processes are also in the set
+            key = f"cmds_run.{ctx.author.id}"
+
+            async with self.bot.redis_batch("cmds_run") as batch:
+                batch.sadd(key, cmd_name)
+                batch.expire(key, CMDS_RUN_EXPIRE_TIME)
+                batch.smembers(key)
+
+            new_cache_cmds = {c.decode() for c in batch.results[-1]}
 
             # Updating in database if the user document was going to be updated anyways or there are 3 or more commands not saved in database
             if user.to_mongo() != new_user.to_mongo() or len(new_cache_cmds) >= 3:
                 new_user.cmds_run = list(set(new_user.cmds_run) | new_cache_cmds)
 
-                if ctx.author.id in self.bot.cmds_run:
-                    del self.bot.cmds_run[ctx.author.id]
+                self.bot.cmds_run.pop(ctx.author.id, None)
+
+                await self.bot.redis.delete(key)
 
             else:
                 self.bot.cmds_run[ctx.author.id] = new_cache_cmds
@@ -393,35 +487,47 @@ class Events(commands.Cog):
         a_earned = {}
         c_completed = {}
 
+        # Only checking the achievements whose inputs changed (every achievement the first time)
+        changed = self.get_changed_inputs(ctx, new_user)
+
         done_checking = False
 
-        while done_checking is False:
+        with tracing.span("check_achievements"):
+            while done_checking is False:
 
-            new_a = False
+                new_a = False
 
-            # Looping through the finished achievements
-            async for a, count, cv, identifier in check_achievements(ctx, new_user):
-                a_earned[identifier] = a_earned.get(identifier, []) + [(a, count, cv)]
-                new_a = True
+                # Looping through the finished achievements
+                async for a, count, cv, identifier in check_achievements(
+                    ctx, new_user, changed
+                ):
+                    a_earned[identifier] = a_earned.get(identifier, []) + [
+                        (a, count, cv)
+                    ]
+                    new_a = True
 
-                # Adding achievemnt to document
-                insert_count = 0 if count is None else count
-                current = new_user.achievements.get(a.name, [])
+                    # Adding achievemnt to document
+                    insert_count = 0 if count is None else count
+                    current = new_user.achievements.get(a.name, [])
 
-                current.insert(insert_count, datetime.utcnow())
+                    current.insert(insert_count, datetime.utcnow())
 
-                new_user.achievements[a.name] = current
+                    new_user.achievements[a.name] = current
 
-            # Looping through the finished categories
-            for n, c in check_categories(new_user, user):
-                c_completed[n] = c.reward
+                changed = {"achievements"}
 
-                if c.changer is not None:
-                    new_user = c.changer(new_user)
+                # Looping through the finished categories
+                for n, c in check_categories(new_user, user):
+                    c_completed[n] = c.reward
 
-            # Continues checking until no new achievements are given in a round (allows chaining achievements)
-            if new_a is False:
-                done_checking = True
+                    if c.changer is not None:
+                        new_user = c.changer(new_user)
+
+                        changed.update(c.reward.changes)
+
+                # Continues checking until no new achievements are given in a round (allows chaining achievements)
+                if new_a is False:
+                    done_checking = True
 
         # Daily challenges
 
@@ -451,6 +557,8 @@ class Events(commands.Cog):
 
         start_placing, after_placing = await _update_placings(ctx, new_user)
 
+        await _update_percentiles(ctx, new_user)
+
         # ----- Done evaluating stuff ------
 
         # Actually sending stuff
@@ -637,11 +745,11 @@ class Events(commands.Cog):
 
                 await ctx.respond(embed=embed, view=view)
 
-        if user.to_mongo() == new_user.to_mongo():
-            return
+        if user.to_mongo() != new_user.to_mongo():
+            # Replacing the user data with the new state
+            await self.bot.mongo.replace_user_data(new_user, ctx.author)
 
-        # Replacing the user data with the new state
-        await self.bot.mongo.replace_user_data(new_user, ctx.author)
+        self.save_achievement_inputs(ctx, new_user)
 
 
 def setup(bot: WordPractice):
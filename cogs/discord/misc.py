@@ -253,8 +253,10 @@ class Misc(commands.Cog):
 
         embed.set_thumbnail(url=self.bot.user.display_avatar.url)
 
-        embed.add_field(name="Servers", value=len(self.bot.guilds), inline=False)
-        embed.add_field(name="Shards", value=len(self.bot.shards), inline=False)
+        guild_count, shard_count = await self.bot.get_cluster_stats()
+
+        embed.add_field(name="Servers", value=guild_count, inline=False)
+        embed.add_field(name="Shards", value=shard_count, inline=False)
         embed.add_field(name="Typists", value=typist_count, inline=False)
         embed.add_field(name="Uptime", value=f"{h} hrs {m} min", inline=False)
 
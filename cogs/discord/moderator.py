@@ -465,7 +465,7 @@ class Moderator(commands.Cog):
         if user.id == ctx.author.id:
             raise commands.BadArgument("You cannot perform this action on yourself")
 
-        return await user_check(ctx, user)
+        return await user_check(ctx, user, read_only=False)
 
     @mod_command
     @discord_user_option
@@ -1,39 +1,109 @@
-import asyncio
+import functools
+import json
 import time
 from datetime import datetime, timedelta
 
 import numpy as np
 from discord.ext import commands, tasks
+from pymongo import UpdateMany, UpdateOne
 
-from bot import WordPractice
+import helpers.metrics as metrics
+from bot import RollingLBCategory, WordPractice
 from config import DBL_TOKEN, TESTING
-from data.constants import AVG_AMT, CHALLENGE_AMT, LB_LENGTH, TEST_EXPIRE_TIME
-from helpers.utils import run_in_executor
+from data.constants import (
+    AVG_AMT,
+    AVG_PERC_INTERVAL,
+    CHALLENGE_AMT,
+    CLUSTER_STATS_EXPIRE_TIME,
+    LEADER_LEASE_TIME,
+    TASK_CHECK_INTERVAL,
+    TASK_HISTORY_AMT,
+    UPDATE_24_HOUR_INTERVAL,
+)
+from helpers.jobs import MaintenanceJob
+from helpers.shared import LeaseLost
+from helpers.user import TOTAL_24H_INTERVALS, RollingStat, get_24h_interval
 
+MIGRATED_24H_KEY = "migrations.24h_stats"
 
-@run_in_executor(include_bot=True)
-def _compile_lb_stats(bot, users):
-    lbs = {}
+# Step of the daily reset that is running, kept until every step is done
+DAILY_RESET_KEY = "tasks.daily_reset"
 
-    for u in users:
-        values = bot.get_leaderboard_values(u)
+# Jobs of the daily reset in order, the cached users are invalidated after the last one
+DAILY_RESET_JOBS = ("reset_24h_stats", "reset_daily_completion")
 
-        for i, lb in enumerate(values):
-            for n, stat in enumerate(lb):
-                name = f"lb.{i}.{n}"
-                lbs[name] = lbs.get(name, []) + [(u.id, stat)]
 
-    return lbs
+def get_stale_interval(started: float):
+    """Users who haven't added anything since this interval have nothing left in their 24 hour window"""
+    return get_24h_interval(started) - TOTAL_24H_INTERVALS + 1
 
 
-@run_in_executor(include_bot=True)
-def _serialize_users(bot, users):
-    serialized = []
+def get_latest_slot(now: float, every: timedelta, offset: timedelta):
+    """Latest time that a task running every `every` from `offset` past the epoch was due"""
+    every = every.total_seconds()
+    offset = offset.total_seconds()
 
-    for u in users:
-        serialized.append(bot.mongo.User.build_from_mongo(u))
+    return (now - offset) // every * every + offset
 
-    return serialized
+
+def singleton(every: timedelta, *, offset=timedelta(), run_at_start=True):
+    """
+    Only runs the task in the cluster holding the lease, recording each run
+
+    Runs are scheduled from the last run in redis rather than the loop of each cluster,
+    so a cluster that takes over the lease runs any task that is overdue
+
+    every: how often the task runs, at offset past the epoch (midnight UTC for days)
+    run_at_start: whether a task that has never run is due straight away
+
+    The task is given the fencing token, it should check it between steps and fence its swaps
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self: "Tasks"):
+            await self.bot.wait_until_ready()
+
+            # Checking the fencing token right before running, in case the lease was lost
+            token = await self.bot.leader.acquire()
+
+            if token is None:
+                return
+
+            start = time.time()
+            slot = get_latest_slot(start, every, offset)
+
+            last = await self.bot.redis.hget("tasks.last", func.__name__)
+
+            if last is None:
+                last_start = None if run_at_start else slot
+            else:
+                last_start = json.loads(last)["start"]
+
+            if last_start is not None and last_start >= slot:
+                return
+
+            error = None
+            completed = True
+
+            try:
+                with metrics.TASK_TIME.time(func.__name__):
+                    await func(self, token)
+            except LeaseLost as e:
+                # The cluster that took over runs the task from now on
+                error = repr(e)
+                completed = False
+                self.bot.log.warning(f"Stopped {func.__name__}: {e}")
+            except Exception as e:
+                metrics.TASK_ERRORS.inc(func.__name__)
+                error = repr(e)
+                raise
+            finally:
+                await self.record_run(func.__name__, token, start, error, completed)
+
+        return wrapper
+
+    return decorator
 
 
 class Tasks(commands.Cog):
@@ -45,6 +115,68 @@ class Tasks(commands.Cog):
             "Authorization": DBL_TOKEN,
         }
 
+        self.jobs = {
+            job.name: job
+            for job in [
+                MaintenanceJob(
+                    bot,
+                    "reset_24h_stats",
+                    "users",
+                    lambda started: {
+                        "$or": [
+                            {
+                                "ring_words_24h.head": {
+                                    "$lt": get_stale_interval(started)
+                                }
+                            },
+                            {"ring_xp_24h.head": {"$lt": get_stale_interval(started)}},
+                        ],
+                    },
+                    self.reset_24h_stats,
+                ),
+                MaintenanceJob(
+                    bot,
+                    "migrate_24h_stats",
+                    "users",
+                    lambda _: {
+                        "$or": [
+                            {"raw_words_24h": {"$exists": True}},
+                            {"raw_xp_24h": {"$exists": True}},
+                        ],
+                    },
+                    self.migrate_24h_stats,
+                    projection={
+                        "raw_words_24h": 1,
+                        "raw_xp_24h": 1,
+                        "last_24h_save": 1,
+                        "ring_words_24h": 1,
+                        "ring_xp_24h": 1,
+                    },
+                ),
+                MaintenanceJob(
+                    bot,
+                    "reset_daily_completion",
+                    "users",
+                    lambda _: {"daily_completion": {"$ne": [False] * CHALLENGE_AMT}},
+                    self.reset_daily_completion,
+                ),
+                MaintenanceJob(
+                    bot,
+                    "expire_subscriptions",
+                    "subscriptions",
+                    lambda started: {
+                        "expired": False,
+                        "expire_time": {"$lt": int(started)},
+                    },
+                    self.expire_subscriptions,
+                    projection={"activated_by": 1},
+                ),
+            ]
+        }
+
+        # Whether the daily reset is running in this process
+        self.resetting = False
+
         task_list = self.get_tasks()
 
         for task in task_list:
@@ -54,11 +186,17 @@ class Tasks(commands.Cog):
 
     def get_tasks(self):
         task_list = [
+            self.elect_leader,
             self.daily_restart,
             self.update_lbs,
+            self.update_24h_lbs,
             self.update_percentiles,
+            self.backfill_percentiles,
             self.clear_cooldowns,
+            self.update_cluster_stats,
             self.remove_expired_subscriptions,
+            self.resume_jobs,
+            self.run_migrations,
         ]
 
         if TESTING is False and DBL_TOKEN is not None:
@@ -70,6 +208,42 @@ class Tasks(commands.Cog):
         for task in self.get_tasks():
             task.cancel()
 
+    async def record_run(
+        self, name: str, token: int, start: float, error: str, completed: bool
+    ):
+        """completed: whether the run counts for the schedule, runs stopped by a lost lease don't"""
+        run = json.dumps(
+            {
+                "cluster": self.bot.cluster_id,
+                "token": token,
+                "start": start,
+                "duration": time.time() - start,
+                "error": error,
+            }
+        )
+
+        async with self.bot.redis_batch("record_run") as batch:
+            batch.lpush(f"tasks.history.{name}", run)
+            batch.ltrim(f"tasks.history.{name}", 0, TASK_HISTORY_AMT - 1)
+
+            if completed:
+                batch.hset("tasks.last", name, run)
+
+    # Renewing the lease often enough that it never expires while this cluster is running
+    @tasks.loop(seconds=LEADER_LEASE_TIME / 3)
+    async def elect_leader(self):
+        await self.bot.get_cog("Redis").wait_until_ready()
+
+        was_leader = self.bot.leader.is_held
+
+        await self.bot.leader.acquire()
+
+        if self.bot.leader.is_held and was_leader is False:
+            self.bot.log.info(
+                f"Cluster {self.bot.cluster_id} is running the background tasks "
+                f"(token {self.bot.leader.token})"
+            )
+
     @tasks.loop(minutes=10)
     async def ensure_tasks(self):
         # Ensures that all tasks are running
@@ -77,182 +251,281 @@ class Tasks(commands.Cog):
             if task.is_running() is False:
                 task.start()
 
-    @tasks.loop(hours=12)
-    async def remove_expired_subscriptions(self):
-        await self.bot.wait_until_ready()
-
-        now = int(time.time())
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(hours=12))
+    async def remove_expired_subscriptions(self, token: int):
+        await self.jobs["expire_subscriptions"].run(token)
 
-        cursor = self.bot.mongo.db.subscriptions.find(
-            {"expired": False, "expire_time": {"$lt": now}}
-        )
+    async def expire_subscriptions(self, subs, _):
+        active_subs = [int(user_id) for u in subs if (user_id := u["activated_by"])]
 
-        expired_subs = [u async for u in cursor]
-        expired_sub_ids = [u["_id"] for u in expired_subs]
+        # Removing premium from users who actived it before marking the subscription as expired
+        # so that the chunk is still found if it has to be repeated
+        if active_subs:
+            await self.bot.mongo.db.users.update_many(
+                {"_id": {"$in": active_subs}},
+                {"$set": {"premium": None}},
+            )
 
-        if not expired_sub_ids:
-            return
+            # Removing users from the cache
+            await self.bot.mongo.invalidate_users(*active_subs)
 
         # Setting subscriptions to expired
         await self.bot.mongo.db.subscriptions.update_many(
-            {"_id": {"$in": expired_sub_ids}},
+            {"_id": {"$in": [u["_id"] for u in subs]}},
             {"$set": {"expired": True}},
         )
 
-        active_subs = [
-            int(user_id) for u in expired_subs if (user_id := u["activated_by"])
-        ]
-
-        if not active_subs:
+    # Converts the documents once, the key is kept so that it isn't scanned again
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(minutes=10))
+    async def run_migrations(self, token: int):
+        if await self.bot.redis.get(MIGRATED_24H_KEY) is not None:
             return
 
-        # Removing premium from users who actived it
-        await self.bot.mongo.db.users.update_many(
-            {"_id": {"$in": active_subs}},
-            {"$set": {"premium": None}},
-        )
+        await self.jobs["migrate_24h_stats"].run(token)
+
+        await self.bot.redis.set(MIGRATED_24H_KEY, 1)
+
+        # Cached users might still have the lists
+        await self.bot.mongo.invalidate_all_users()
 
-        # Removing users from the cache
-        await self.bot.redis.hdel("user", *active_subs)
+    # Continues jobs that were interrupted, for example by a restart
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(minutes=10))
+    async def resume_jobs(self, token: int):
+        # Finishing the rest of an interrupted daily reset as well, not just the job it was on
+        await self.run_daily_reset(token)
 
-    # Updates the typing average percentile
-    # Is updated infrequently because it provides an estimate
-    @tasks.loop(hours=12)
+        for job in self.jobs.values():
+            if await job.get_checkpoint() is not None:
+                await job.run(token)
+
+    # Reads the typing average percentiles from the sketches that are updated after every test
+    @tasks.loop(minutes=AVG_PERC_INTERVAL)
     async def update_percentiles(self):
+        await self.bot.wait_until_ready()
+
+        sketches = self.bot.avg_sketches
+
+        async with self.bot.redis_batch("update_percentiles") as batch:
+            for sketch in sketches:
+                batch.hgetall(sketch.key)
+
+        new_perc = [
+            sketch.get_percentiles(counts, [33, 66])
+            for sketch, counts in zip(sketches, batch.results)
+        ]
+
+        if None not in new_perc:
+            self.bot.avg_perc = new_perc
+
+    # Rebuilds the sketches from the exact averages of every user
+    # Also corrects any drift from updates that were missed
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(days=1))
+    async def backfill_percentiles(self, token: int):
         # Fetching the average wpm, raw and acc for every user in their last 10 tests
         a = self.bot.mongo.db.users.aggregate(
             [
+                {"$match": {"scores.0": {"$exists": True}}},
                 {
                     "$project": {
                         "_id": 0,
-                        "wpm": {"$sum": {"$slice": ["$scores.wpm", AVG_AMT]}},
-                        "raw": {"$sum": {"$slice": ["$scores.raw", AVG_AMT]}},
-                        "acc": {"$sum": {"$slice": ["$scores.acc", AVG_AMT]}},
-                        "amt": {"$size": "$scores"},
+                        "wpm": {"$avg": {"$slice": ["$scores.wpm", -AVG_AMT]}},
+                        "raw": {"$avg": {"$slice": ["$scores.raw", -AVG_AMT]}},
+                        "acc": {"$avg": {"$slice": ["$scores.acc", -AVG_AMT]}},
                     }
-                }
+                },
             ]
         )
 
-        total = zip(
-            *[
-                (
-                    m["wpm"] / (score_amt := min(m["amt"], AVG_AMT)),
-                    m["raw"] / score_amt,
-                    m["acc"] / score_amt,
-                )
-                async for m in a
-                if m["amt"] != 0
-            ]
-        )
+        total = list(zip(*[(m["wpm"], m["raw"], m["acc"]) async for m in a]))
+
+        if not total:
+            return
+
+        sketches = self.bot.avg_sketches
+
+        # The aggregation can take a while
+        await self.bot.leader.check(token)
+
+        async with self.bot.redis_batch(
+            "backfill_percentiles", transaction=True
+        ) as batch:
+            for sketch, values in zip(sketches, total):
+                batch.delete(sketch.key)
+                batch.hset(sketch.key, mapping=sketch.build(values))
 
-        new_perc = []
+        exact = [[np.percentile(t, 33), np.percentile(t, 66)] for t in total]
 
-        # Calculating the percentile for each category
-        for t in total:
-            new_perc.append(
-                [
-                    np.percentile(t, 33),
-                    np.percentile(t, 66),
-                ]
+        # Logging how far the sketch estimates are from the exact percentiles
+        if self.bot.avg_perc:
+            drift = max(
+                abs(e - s)
+                for exact_perc, sketch_perc in zip(exact, self.bot.avg_perc)
+                for e, s in zip(exact_perc, sketch_perc)
             )
 
-        self.bot.avg_perc = new_perc
+            self.bot.log.info(f"Average percentile sketch drift: {drift:.2f}")
 
-    @tasks.loop(minutes=30)
-    async def post_guild_count(self):
+        self.bot.avg_perc = exact
+
+    # Shares the guild and shard count of this cluster with the others
+    @tasks.loop(minutes=5)
+    async def update_cluster_stats(self):
         await self.bot.wait_until_ready()
 
-        if self.post_guild_count.current_loop != 0:
-            payload = {
-                "server_count": len(self.bot.guilds),
-                "shard_count": len(self.bot.shards),
-            }
+        key = f"cluster.{self.bot.cluster_id}"
 
-            url = f"https://top.gg/api/bots/{self.bot.user.id}/stats"
+        guilds, shards = self.bot.get_local_cluster_stats()
 
-            async with self.bot.session.request(
-                "POST", url, headers=self.headers, data=payload
-            ) as resp:
-                assert resp.status == 200
+        async with self.bot.redis_batch("update_cluster_stats") as batch:
+            batch.hset(key, mapping={"guilds": guilds, "shards": shards})
 
-    @tasks.loop(hours=24)
-    async def daily_restart(self):
-        # Removing users whose 24h stats have not been updated in the last 24h
-        await self.bot.mongo.db.users.update_many(
-            {
-                "last_24h_save": {
-                    "$lt": datetime.utcnow() - timedelta(days=1),
-                },
-            },
-            {"$set": {"raw_words_24h": [], "raw_xp_24h": []}},
-        )
+            # Clusters that stop running are removed from the stats
+            batch.expire(key, CLUSTER_STATS_EXPIRE_TIME)
 
-        # Resetting daily challenge completions and tests
-        default = [False] * CHALLENGE_AMT
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(minutes=30), run_at_start=False)
+    async def post_guild_count(self, _):
+        guild_count, shard_count = await self.bot.get_cluster_stats()
 
-        cursor = self.bot.mongo.db.users.find({"daily_completion": {"$ne": default}})
+        payload = {
+            "server_count": guild_count,
+            "shard_count": shard_count,
+        }
 
-        daily_completion_ids = [u["_id"] async for u in cursor]
+        url = f"https://top.gg/api/bots/{self.bot.user.id}/stats"
 
-        await self.bot.mongo.db.users.update_many(
-            {"_id": {"$in": daily_completion_ids}},
-            {"$set": {"daily_completion": default}},
+        async with self.bot.session.request(
+            "POST", url, headers=self.headers, data=payload
+        ) as resp:
+            assert resp.status == 200
+
+    # Runs at the end of each day
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(
+        timedelta(days=1), offset=timedelta(hours=23, minutes=59), run_at_start=False
+    )
+    async def daily_restart(self, token: int):
+        if not self.resetting:
+            await self.bot.redis.set(DAILY_RESET_KEY, 0)
+
+        await self.run_daily_reset(token)
+
+    async def run_daily_reset(self, token: int):
+        """Runs the daily reset from the step that it is on, does nothing if it isn't running"""
+        if self.resetting:
+            return
+
+        self.resetting = True
+
+        try:
+            step = await self.bot.redis.get(DAILY_RESET_KEY)
+
+            if step is None:
+                return
+
+            # Removing users whose 24h stats have not been updated in the last 24h
+            # and resetting daily challenge completions and tests
+            for i in range(int(step), len(DAILY_RESET_JOBS)):
+                await self.bot.redis.set(DAILY_RESET_KEY, i)
+
+                await self.jobs[DAILY_RESET_JOBS[i]].run(token)
+
+            # Invalidating every cached user at once
+            await self.bot.mongo.invalidate_all_users()
+
+            await self.bot.redis.delete(DAILY_RESET_KEY)
+        finally:
+            self.resetting = False
+
+    async def reset_24h_stats(self, users, started):
+        ids = [u["_id"] for u in users]
+        stale = get_stale_interval(started)
+
+        # Stale rings already read as 0, each ring is only cleared if it is still stale
+        # so that anything added since the chunk was read is kept
+        await self.bot.mongo.db.users.bulk_write(
+            [
+                UpdateMany(
+                    {"_id": {"$in": ids}, f"{field}.head": {"$lt": stale}},
+                    {"$set": {field: {}}},
+                )
+                for field in ("ring_words_24h", "ring_xp_24h")
+            ],
+            ordered=False,
         )
 
-        # Just removing all users from the cache
-        a = await self.bot.redis.hgetall("user")
+    async def migrate_24h_stats(self, users, _):
+        requests = []
 
-        await self.bot.redis.hdel("user", *a.keys())
+        for u in users:
+            update = {}
 
-    @tasks.loop(hours=2)
-    async def update_lbs(self):
-        await self.bot.wait_until_ready()
+            for name in ("words", "xp"):
+                legacy = u.get(f"raw_{name}_24h")
 
-        # Querying all the users and evaluating their scores
-        cursor = self.bot.mongo.db.users.find()
+                # Users that added to the ring since have already converted the list
+                if legacy and not u.get(f"ring_{name}_24h"):
+                    ring = RollingStat.from_list(
+                        legacy, u.get("last_24h_save", datetime.min)
+                    )
 
-        raw_users = [u async for u in cursor]
+                    update[f"ring_{name}_24h"] = ring.to_dict()
 
-        users = await _serialize_users(self.bot, raw_users)
+            query = {"$unset": {"raw_words_24h": "", "raw_xp_24h": ""}}
 
-        lbs = await _compile_lb_stats(self.bot, users)
+            if update:
+                query["$set"] = update
 
-        for lb, values in lbs.items():
-            # Sorting the scores and trimming to leaderboard length
-            sorted_values = sorted(values, key=lambda x: x[1], reverse=True)[:LB_LENGTH]
+            # Skipped if the user changed since it was read, the next run converts it
+            requests.append(
+                UpdateOne(
+                    {
+                        "_id": u["_id"],
+                        "raw_words_24h": u.get("raw_words_24h"),
+                        "raw_xp_24h": u.get("raw_xp_24h"),
+                    },
+                    query,
+                )
+            )
 
-            # Wiping the current leaderboard
-            await self.bot.redis.zremrangebyrank(lb, 0, -1)
+        await self.bot.mongo.db.users.bulk_write(requests, ordered=False)
 
-            # Saving the scores to the leaderboard
-            await self.bot.redis.zadd(lb, dict(sorted_values))
+    async def reset_daily_completion(self, users, _):
+        await self.bot.mongo.db.users.update_many(
+            {"_id": {"$in": [u["_id"] for u in users]}},
+            {"$set": {"daily_completion": [False] * CHALLENGE_AMT}},
+        )
+
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(hours=2))
+    async def update_lbs(self, token: int):
+        for lb in self.bot.lbs:
+            for stat in lb.stats:
+                # Renewing the lease between the leaderboards, the swaps are fenced as well
+                await self.bot.leader.check(token)
+                await stat.update(token)
+
+    @tasks.loop(seconds=TASK_CHECK_INTERVAL)
+    @singleton(timedelta(minutes=UPDATE_24_HOUR_INTERVAL))
+    async def update_24h_lbs(self, token: int):
+        # Dropping the buckets that have left the 24 hour window
+        for lb in self.bot.lbs:
+            for stat in lb.stats:
+                if isinstance(stat, RollingLBCategory):
+                    await self.bot.leader.check(token)
+                    await stat.refresh(token)
 
     # Clearing cache
     @tasks.loop(minutes=10)
     async def clear_cooldowns(self):
-        # Removes cooldowns that have already expired
-        for c in self.bot.cooldowns.copy():
-            if time.time() > self.bot.cooldowns[c]:
-                del self.bot.cooldowns[c]
-
-        # Removing active tests that should have been removed
-        for m in self.bot.active_tests.copy():
-            if time.time() > self.bot.active_tests[m] + TEST_EXPIRE_TIME:
-                del self.bot.active_tests[m]
-
-    # Makes sure that the task only gets executed at the end of the day
-    @daily_restart.before_loop
-    async def before_my_task(self):
-        await self.bot.wait_until_ready()
-
-        now = datetime.utcnow()
-
-        future = datetime(now.year, now.month, now.day, 23, 59)
-        if now.hour >= 23 and now.minute > 59:
-            future += timedelta(days=1)
-
-        await asyncio.sleep((future - now).seconds)
+        # Removes local cooldowns and active tests that expired without being accessed again
+        # The redis keys expire on their own
+        self.bot.cooldowns.local.expire()
+        self.bot.active_tests.local.expire()
 
 
 def setup(bot: WordPractice):
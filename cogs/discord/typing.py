@@ -18,6 +18,7 @@ from discord.utils import escape_markdown
 from humanfriendly import format_timespan
 
 import data.icons as icons
+import helpers.tracing as tracing
 import word_list
 from bot import Context, WordPractice
 from data.constants import (
@@ -105,10 +106,6 @@ def _load_test_file(name):
     return data["words"], data.get("wrap", DEFAULT_WRAP)
 
 
-def _author_is_user(ctx: Context):
-    return lambda m: m.author.id == ctx.author.id
-
-
 def _get_word_display(quote, raw_quote):
     return f"{len(quote)} ({len(raw_quote)} chars)"
 
@@ -749,7 +746,7 @@ class HighScoreCaptchaView(BaseView):
             await self.ctx.bot.impt_wh.send(embed=embed)
 
     async def handle_captcha(self, view, button, interaction):
-        self.ctx.bot.active_start(self.ctx.author.id)
+        await self.ctx.bot.active_start(self.ctx.author.id)
 
         button.disabled = True
 
@@ -815,16 +812,14 @@ class HighScoreCaptchaView(BaseView):
         finished_test = True
 
         try:
-            message = await self.ctx.bot.wait_for(
-                "message",
-                check=_author_is_user(self.ctx),
-                timeout=expire_time,
+            message = await self.ctx.bot.router.wait_for_message(
+                self.ctx, timeout=expire_time
             )
         except asyncio.TimeoutError:
             raw = acc = word_history = None
             finished_test = False
 
-        self.ctx.bot.active_end(self.ctx.author.id)
+        await self.ctx.bot.active_end(self.ctx.author.id)
 
         if finished_test:
             end_time = _get_test_time(
@@ -1087,7 +1082,7 @@ class RaceEndView(BaseView):
 
         await interaction.response.edit_message(view=self)
 
-        self.callback()
+        await self.callback()
 
 
 class RaceJoinView(BaseView):
@@ -1129,20 +1124,20 @@ class RaceJoinView(BaseView):
         race_member = RaceMember(author, self.user)
         self.racers[author.id] = race_member
 
-    def end_all_racers(self):
+    async def end_all_racers(self):
         for r in self.racers:
-            self.ctx.bot.active_end(r)
+            await self.ctx.bot.active_end(r)
 
     async def remove_racer(self, interaction):
         user = interaction.user
 
-        self.ctx.bot.active_end(user.id)
+        await self.ctx.bot.active_end(user.id)
 
         # If the author leaves, the race is ended
         is_author = user.id == self.ctx.author.id
 
         if is_author:
-            self.end_all_racers()
+            await self.end_all_racers()
 
             embed = self.ctx.error_embed(
                 title=f"{icons.caution} Race Ended",
@@ -1189,17 +1184,17 @@ class RaceJoinView(BaseView):
 
         return embed
 
-    def end_race_early(self):
+    async def end_race_early(self):
         # Canceling the input tasks
         if self.waiting_for_inputs is not None:
             self.waiting_for_inputs.cancel()
 
         # Removing the active test remove all members
         for r in self.racers:
-            self.ctx.bot.active_end(r)
+            await self.ctx.bot.active_end(r)
 
     async def handle_racer_finish(self, m):
-        self.ctx.bot.active_end(m.author.id)
+        await self.ctx.bot.active_end(m.author.id)
 
         # Checking if it was the author who finished
         if m.author.id == self.ctx.author.id:
@@ -1307,9 +1302,7 @@ class RaceJoinView(BaseView):
     async def wait_for_inputs(self):
         # Handles the racer input for a single user
         async def handle_input(r):
-            message = await self.ctx.bot.wait_for(
-                "message", check=lambda m: m.author.id == r
-            )
+            message = await self.ctx.bot.router.wait_for_message(self.ctx, r)
 
             try:
                 await message.delete()
@@ -1459,10 +1452,7 @@ class RaceJoinView(BaseView):
 
             embeds += embed
 
-        for i in range(0, len(embeds), 10):
-            show_embeds = embeds[i : i + 10]
-
-            await self.ctx.bot.test_wh.send(embeds=show_embeds)
+        await self.ctx.bot.test_wh.send(embeds=embeds)
 
     async def add_racer(self, interaction):
         if len(self.racers) == MAX_RACE_JOIN - 1:
@@ -1528,7 +1518,7 @@ class RaceJoinView(BaseView):
                     ephemeral=True,
                 )
 
-            self.ctx.bot.active_start(user.id)
+            await self.ctx.bot.active_start(user.id)
 
             self.racers[user.id] = RaceMember(user, user_data)
 
@@ -1570,7 +1560,7 @@ class RaceJoinView(BaseView):
             self.stop()
 
     async def send_expire_race_message(self):
-        self.end_all_racers()
+        await self.end_all_racers()
 
         timespan = format_timespan(RACE_JOIN_EXPIRE_TIME)
 
@@ -1601,7 +1591,7 @@ class RaceJoinView(BaseView):
         return embed
 
     async def start(self):
-        self.ctx.bot.active_start(self.ctx.author.id)
+        await self.ctx.bot.active_start(self.ctx.author.id)
 
         embed = self.get_race_join_embed()
 
@@ -1775,7 +1765,7 @@ class Typing(commands.Cog):
 
     @staticmethod
     async def personal_test_input(user, ctx: Context, test_type_int, quote_info):
-        ctx.bot.active_start(ctx.author.id)
+        await ctx.bot.active_start(ctx.author.id)
 
         quote, wrap_width = quote_info
 
@@ -1867,7 +1857,8 @@ class Typing(commands.Cog):
 
         embed.description = desc
 
-        send_msg = await ctx.respond(embed=embed, file=file)
+        with tracing.span("send_test_image", format=image_format):
+            send_msg = await ctx.respond(embed=embed, file=file)
 
         lag = _get_lag_from_start_time(start_lag)
 
@@ -1877,10 +1868,8 @@ class Typing(commands.Cog):
         # Waiting for the input from the user
 
         try:
-            message = await ctx.bot.wait_for(
-                "message",
-                check=_author_is_user(ctx),
-                timeout=TEST_EXPIRE_TIME,
+            message = await ctx.bot.router.wait_for_message(
+                ctx, timeout=TEST_EXPIRE_TIME
             )
         except asyncio.TimeoutError:
             embed = ctx.error_embed(
@@ -1901,7 +1890,7 @@ class Typing(commands.Cog):
             return message, end_time, pacer_name, raw_quote
 
         finally:
-            ctx.bot.active_end(ctx.author.id)
+            await ctx.bot.active_end(ctx.author.id)
 
     @classmethod
     async def do_typing_test(cls, ctx: Context, is_dict, quote_info, length):
@@ -2082,7 +2071,7 @@ class Typing(commands.Cog):
 
             score.is_hs = True
 
-            user.highspeed[zone] = score
+            user.set_highspeed(zone, score)
 
             description = f"You got a new high score of **{score.wpm}** on the **{zone} test** {zone_range}"
 
@@ -2091,9 +2080,7 @@ class Typing(commands.Cog):
 
             initial_value = c.get_initial_value(ctx)
 
-            score_lb = await c.get_lb_values_from_score(max="inf", min=initial_value)
-
-            estimate = estimate_placing(score_lb, initial_value, score.wpm)
+            estimate = await c.estimate_placing(initial_value, score.wpm)
 
             if estimate is not None:
                 potential_placing, diff = estimate
@@ -2136,7 +2123,7 @@ class Typing(commands.Cog):
 
     @classmethod
     async def handle_interval_captcha(cls, ctx: Context, user, is_dict, length):
-        ctx.bot.active_start(ctx.author.id)
+        await ctx.bot.active_start(ctx.author.id)
 
         # Getting the quote for the captcha
         words, _ = _load_test_file(word_list.languages["english"]["normal"])
@@ -2159,9 +2146,7 @@ class Typing(commands.Cog):
 
         # Waiting for user input
         try:
-            message = await ctx.bot.wait_for(
-                "message", check=_author_is_user(ctx), timeout=120
-            )
+            message = await ctx.bot.router.wait_for_message(ctx, timeout=120)
         except asyncio.TimeoutError:
             embed = ctx.error_embed(
                 title="Captcha Expired",
@@ -2171,7 +2156,7 @@ class Typing(commands.Cog):
             return
 
         finally:
-            ctx.bot.active_end(ctx.author.id)
+            await ctx.bot.active_end(ctx.author.id)
 
         word_display = f"**Word:** {captcha_word}"
 
@@ -0,0 +1,85 @@
+from aiohttp import web
+from discord.ext import commands
+
+import helpers.metrics as metrics
+from bot import LOG_WEBHOOKS, WordPractice
+from config import METRICS_PORT
+
+
+class Metrics(commands.Cog):
+    """Serves the metrics of the cluster in the Prometheus text format at /metrics"""
+
+    def __init__(self, bot: WordPractice):
+        self.bot = bot
+
+        self.runner = None
+
+        metrics.add_collector(self.collect)
+
+        if METRICS_PORT:
+            self.bot.loop.create_task(self.start_server())
+
+    def cog_unload(self):
+        metrics.remove_collector(self.collect)
+
+        if self.runner is not None:
+            self.bot.loop.create_task(self.runner.cleanup())
+
+    async def start_server(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+
+        port = METRICS_PORT + self.bot.cluster_id
+
+        await web.TCPSite(self.runner, port=port).start()
+
+        self.bot.log.info(f"Serving metrics on port {port}")
+
+    async def handle_metrics(self, _):
+        text = metrics.render({"cluster": self.bot.cluster_id})
+
+        return web.Response(text=text, content_type="text/plain")
+
+    def collect(self):
+        """Gauges that are read from the bot when the metrics are rendered"""
+        for shard_id, latency in self.bot.latencies:
+            yield "wordpractice_shard_latency_seconds", {"shard": shard_id}, latency
+
+        yield "wordpractice_guilds", {}, len(self.bot.guilds)
+
+        for batch, stats in self.bot.get_cog("Redis").batch_stats.items():
+            for stat, value in stats.items():
+                yield "wordpractice_redis_batch", {"batch": batch, "stat": stat}, value
+
+        for name, shared in (
+            ("cooldowns", self.bot.cooldowns),
+            ("active_tests", self.bot.active_tests),
+        ):
+            for stat, value in shared.local.metrics.items():
+                yield "wordpractice_expiring_map", {"map": name, "stat": stat}, value
+
+        for name in LOG_WEBHOOKS:
+            # Only the webhooks that have been used
+            if (shipper := self.bot.__dict__.get(name)) is None:
+                continue
+
+            yield "wordpractice_log_queue_size", {
+                "webhook": name
+            }, shipper.queue.qsize()
+
+            for stat, value in shipper.stats.items():
+                yield "wordpractice_log", {"webhook": name, "stat": stat}, value
+
+        router = self.bot.router.router
+
+        yield "wordpractice_router_waiters", {}, len(router)
+
+        for stat, value in router.stats.items():
+            yield "wordpractice_router", {"stat": stat}, value
+
+
+def setup(bot: WordPractice):
+    bot.add_cog(Metrics(bot))
@@ -10,6 +10,7 @@ from discord.ext import commands
 from discord.utils import escape_markdown
 from motor.motor_asyncio import AsyncIOMotorClient
 from umongo import Document, EmbeddedDocument, exceptions
+from umongo.document import DocumentImplementation
 from umongo.fields import (
     BooleanField,
     DateTimeField,
@@ -21,8 +22,11 @@ from umongo.fields import (
     StringField,
 )
 from umongo.frameworks import MotorAsyncIOInstance
+from umongo.frameworks.tools import cook_find_filter
 
 import data.icons as icons
+import helpers.metrics as metrics
+import helpers.tracing as tracing
 from bot import Context, WordPractice
 from challenges.rewards import BadgeReward
 from config import DATABASE_NAME, DATABASE_URI
@@ -36,13 +40,31 @@ from data.constants import (
     PREMIUM_SAVE_AMT,
     SCORE_SAVE_AMT,
     TEST_ZONES,
+    USER_CACHE_TIME,
     VOTING_SITES,
 )
+from helpers.percentiles import get_sketch_averages
+from helpers.read_model import get_read_model
 from helpers.ui import get_log_embed
-from helpers.user import get_24h_stat
+from helpers.user import RollingStat, ScoreStats, get_24h_interval
 from helpers.utils import datetime_to_unix, get_test_type
 from static.badges import get_badge_from_id
 
+USER_GEN_KEY = "user.gen"
+
+# Caches a user stamped with the current generations, unless they changed since it was read
+CACHE_USER_SCRIPT = """
+local gens = tonumber(redis.call("GET", KEYS[1]) or "0") .. ":" .. tonumber(redis.call("GET", KEYS[2]) or "0")
+
+if ARGV[3] ~= "" and ARGV[3] ~= gens then
+    return 0
+end
+
+redis.call("SET", KEYS[3], gens .. ":" .. ARGV[1], "EX", ARGV[2])
+
+return 1
+"""
+
 
 def _get_meta_data(user):
     return {
@@ -193,7 +215,11 @@ class UserBase(Document):
     daily_completion = ListField(BooleanField, default=[False] * CHALLENGE_AMT)
     last_season_value = IntegerField(default=0)  # value of the last season completion
 
-    # 24 Hour
+    # 24 Hour (RollingStat)
+    ring_words_24h = DictField(default={})
+    ring_xp_24h = DictField(default={})
+
+    # Lists of intervals used before the rings, converted by the migrate_24h_stats job
     raw_words_24h = ListField(IntegerField, default=[])
     raw_xp_24h = ListField(IntegerField, default=[])
 
@@ -205,6 +231,7 @@ class UserBase(Document):
     # Typing
     highspeed = DictField(StringField(), EmbeddedField(Score), required=True)
     scores = ListField(EmbeddedField(Score), default=[])
+    score_stats = DictField(default={})  # rolling statistics of the scores (ScoreStats)
 
     # Other statistics
     achievements = DictField(
@@ -248,6 +275,16 @@ class User(UserBase):
     class Meta:
         collection_name = "users"
 
+    # (24 hour interval, leaderboard values) cached by WordPractice.get_leaderboard_values
+    lb_snapshot = None
+
+    def __setattr__(self, name, value):
+        if name in self.bot.lb_fields:
+            self.lb_snapshot = None
+
+        # The registered class doesn't inherit from this template, so super() can't be used
+        DocumentImplementation.__setattr__(self, name, value)
+
     @property
     def unix_created_at(self):
         return datetime_to_unix(self.created_at)
@@ -275,13 +312,19 @@ class User(UserBase):
 
         return f"{icon_display}{self.username}{status_display}"
 
+    def _get_rolling_stat(self, ring: dict, legacy: list):
+        if not ring and legacy:
+            return RollingStat.from_list(legacy, self.last_24h_save)
+
+        return RollingStat(ring)
+
     @property
     def words_24h(self):
-        return get_24h_stat(self.raw_words_24h, self.last_24h_save)
+        return self._get_rolling_stat(self.ring_words_24h, self.raw_words_24h)
 
     @property
     def xp_24h(self):
-        return get_24h_stat(self.raw_xp_24h, self.last_24h_save)
+        return self._get_rolling_stat(self.ring_xp_24h, self.raw_xp_24h)
 
     @property
     def is_premium(self):
@@ -329,18 +372,34 @@ class User(UserBase):
     def highest_speed(self):
         return max(s.wpm for s in self.highspeed.values())
 
+    @property
+    def stats(self):
+        stats = ScoreStats(self.score_stats)
+
+        last = self.scores[-1].timestamp if self.scores else None
+
+        # Rebuilding if the scores were changed without add_score (or before the statistics existed)
+        if stats.last != last:
+            stats = ScoreStats.from_scores(self.scores)
+
+        return stats
+
     def add_24h_stats(self, xp: int = 0, words: int = 0):
-        new_words_24h = self.words_24h
-        new_xp_24h = self.xp_24h
+        words_24h = self.words_24h
+        xp_24h = self.xp_24h
 
-        if new_words_24h != self.raw_words_24h or new_xp_24h != self.raw_xp_24h:
-            self.last_24h_save = datetime.utcnow()
+        interval = get_24h_interval()
 
-        new_xp_24h[-1] += xp
-        new_words_24h[-1] += words
+        words_24h.add(words, interval)
+        xp_24h.add(xp, interval)
 
-        self.raw_words_24h = new_words_24h
-        self.raw_xp_24h = new_xp_24h
+        self.ring_words_24h = words_24h.to_dict()
+        self.ring_xp_24h = xp_24h.to_dict()
+
+        # The lists were converted into the rings
+        if self.raw_words_24h or self.raw_xp_24h:
+            self.raw_words_24h = []
+            self.raw_xp_24h = []
 
     def add_words(self, words: int):
         self.words += words
@@ -353,11 +412,22 @@ class User(UserBase):
         self.add_24h_stats(xp=xp)
 
     def add_score(self, score: Score):
+        stats = self.stats
+        stats.add(score, self.scores)
+
         if len(self.scores) >= self.save_amt:
             del self.scores[: len(self.scores) - self.save_amt + 1]
 
         self.scores.append(score)
 
+        self.score_stats = stats.to_dict()
+
+    def set_highspeed(self, zone: str, score: Score):
+        self.highspeed[zone] = score
+
+        # Changed in place, so __setattr__ doesn't see it
+        self.lb_snapshot = None
+
     def add_badge(self, badge_id):
         if badge_id not in self.badges:
             # Setting as status if it's their first badge
@@ -481,32 +551,95 @@ class ActivityTournament(Tournament):
     lb_size = IntegerField(required=True)
 
     initial_rankings = DictField(StringField(), IntegerField(), default={})
-    final_rankings = DictField(StringField(), IntegerField(), default={})
+    final_rankings = DictField(StringField(), IntegerField(), default={})  # standings
+
+    @property
+    def rankings_key(self):
+        return f"tournament.{self.id}"
+
+    @property
+    def seeded_key(self):
+        return f"{self.rankings_key}.seeded"
+
+    @property
+    def has_started(self):
+        return self.start_time <= datetime.utcnow()
+
+    @property
+    def is_active(self):
+        return self.start_time <= datetime.utcnow() < self.end_time
+
+    @property
+    def is_finalized(self):
+        return bool(self.final_rankings)
+
+    async def seed_rankings(self, bot: WordPractice):
+        """Creates the standings from the leaderboard if they aren't in redis yet"""
+        # Nothing is earned before the tournament starts
+        if not self.has_started:
+            return
+
+        if not await bot.redis.set(self.seeded_key, 1, nx=True):
+            return
+
+        lb = await bot.lbs[self.category].stats[self.stat].get_lb_data(end=-1)
+
+        standings = {
+            key: value - self.initial_rankings.get(str(key), 0)
+            for key, value in lb.items()
+        }
+
+        # Increments that were made before seeding are already part of the leaderboard
+        async with bot.redis_batch("seed_tournament", transaction=True) as batch:
+            batch.delete(self.rankings_key)
+
+            if standings:
+                batch.zadd(self.rankings_key, standings)
+
+    async def finalize_rankings(self, bot: WordPractice, rankings: dict):
+        self.final_rankings = {key: int(value) for key, value in rankings.items()}
+
+        await self.commit()
+
+        await bot.redis.delete(self.rankings_key, self.seeded_key)
 
     async def get_rankings(self, bot: WordPractice):
-        if self.final_rankings:
-            lb = self.final_rankings
-        else:
-            lb = await bot.lbs[self.category].stats[self.stat].get_lb_data(end=-1)
-
-        return dict(
-            sorted(
-                [
-                    [str(key), lb[key] - self.initial_rankings.get(str(key), 0)]
-                    for key in lb
-                ],
-                key=lambda item: item[1],
-                reverse=True,
-            )[: self.lb_size]
+        if self.is_finalized:
+            return dict(
+                sorted(
+                    self.final_rankings.items(),
+                    key=lambda item: item[1],
+                    reverse=True,
+                )
+            )
+
+        if not self.has_started:
+            return {}
+
+        await self.seed_rankings(bot)
+
+        raw_data = await bot.redis.zrevrange(
+            self.rankings_key, 0, self.lb_size - 1, withscores=True
         )
 
+        rankings = {u.decode(): v for u, v in raw_data}
+
+        # Snapshotting the standings once the tournament is over
+        if self.end_time <= datetime.utcnow():
+            await self.finalize_rankings(bot, rankings)
+
+        return rankings
+
     async def get_score(self, bot: WordPractice, user_id: int):
-        score = await bot.redis.zscore(f"lb.{self.category}.{self.stat}", user_id)
+        if self.is_finalized:
+            return self.final_rankings.get(str(user_id), None)
 
-        if not score:
+        if not self.has_started:
             return None
 
-        return score - self.initial_rankings.get(str(user_id), 0)
+        await self.seed_rankings(bot)
+
+        return await bot.redis.zscore(self.rankings_key, user_id)
 
     @property
     def ranking_size(self) -> int:
@@ -523,6 +656,31 @@ class ActivityTournament(Tournament):
         return "Earn as much XP as you can by completing typing tests."
 
 
+DOCUMENTS = (
+    "Infraction",
+    "Score",
+    "PremiumMembership",
+    "UserBase",
+    "User",
+    "UserBackup",
+    "Tournament",
+    "QualificationTournament",
+    "ActivityTournament",
+)
+
+
+def register_documents(instance, bot) -> dict:
+    g = globals()
+
+    documents = {}
+
+    for n in DOCUMENTS:
+        documents[n] = instance.register(g[n])
+        documents[n].bot = bot
+
+    return documents
+
+
 class Mongo(commands.Cog):
     def __init__(self, bot: WordPractice):
         self.bot = bot
@@ -530,21 +688,21 @@ class Mongo(commands.Cog):
 
         instance = MotorAsyncIOInstance(self.db)
 
-        g = globals()
-
-        for n in (
-            "Infraction",
-            "Score",
-            "PremiumMembership",
-            "UserBase",
-            "User",
-            "UserBackup",
-            "Tournament",
-            "QualificationTournament",
-            "ActivityTournament",
-        ):
-            setattr(self, n, instance.register(g[n]))
-            getattr(self, n).bot = bot
+        for n, document in register_documents(instance, bot).items():
+            setattr(self, n, document)
+
+        # Used instead of User when the user isn't changed
+        self.ReadOnlyUser = get_read_model(self.User)
+
+        self.bot.loop.create_task(self.create_lb_indexes())
+
+        self._cache_script = None
+
+    async def create_lb_indexes(self):
+        # Indexes used to compute the leaderboards inside the database
+        for lb in self.bot.lbs:
+            for stat in lb.stats:
+                await self.db.users.create_index(stat.aggregation.index)
 
     def get_auto_mod(self, mod):
         if mod is None:
@@ -556,13 +714,77 @@ class Mongo(commands.Cog):
 
         return mod, mod_id
 
-    async def get_user_from_cache(self, user_id: int):
-        u = await self.bot.redis.hget("user", user_id)
+    def _get_cache_keys(self, user_id: int):
+        return f"user.{user_id}.gen", f"user.{user_id}"
 
-        if u is not None:
-            u = self.User.build_from_mongo(pickle.loads(u))
+    def _build_user(self, data: dict, read_only: bool):
+        if read_only:
+            return self.ReadOnlyUser(data)
 
-        return u
+        return self.User.build_from_mongo(data)
+
+    def _load_cached_user(
+        self, user_id: int, global_gen, user_gen, entry, read_only: bool = False
+    ):
+        """Returns the user and the generations that a new entry should be stamped with"""
+        gens = f"{int(global_gen or 0)}:{int(user_gen or 0)}"
+
+        if entry is None:
+            return None, gens
+
+        entry_global_gen, entry_user_gen, data = entry.split(b":", 2)
+
+        # Entries from before an invalidation are stale
+        if f"{int(entry_global_gen)}:{int(entry_user_gen)}" != gens:
+            self.bot.loop.create_task(self.bot.redis.unlink(f"user.{user_id}"))
+
+            return None, gens
+
+        return self._build_user(pickle.loads(data), read_only), gens
+
+    @tracing.traced("user_cache.get")
+    async def get_user_from_cache(self, user_id: int, read_only: bool = False):
+        """Returns the cached user (or None) and the generations at the time of reading"""
+        values = await self.bot.redis.mget(USER_GEN_KEY, *self._get_cache_keys(user_id))
+
+        return self._load_cached_user(user_id, *values, read_only=read_only)
+
+    async def get_cache_gens(self, user_id: int):
+        """Generations that a new entry of the user should be stamped with"""
+        global_gen, user_gen = await self.bot.redis.mget(
+            USER_GEN_KEY, self._get_cache_keys(user_id)[0]
+        )
+
+        return f"{int(global_gen or 0)}:{int(user_gen or 0)}"
+
+    @tracing.traced("user_cache.set")
+    async def cache_user(self, user_id: int, data: dict, gens: str = None):
+        """
+        data: raw user document
+        gens: generations from before the data was read, the entry isn't saved if they changed
+        """
+        if self._cache_script is None:
+            self._cache_script = self.bot.redis.register_script(CACHE_USER_SCRIPT)
+
+        await self._cache_script(
+            keys=[USER_GEN_KEY, *self._get_cache_keys(user_id)],
+            args=[pickle.dumps(data), USER_CACHE_TIME, gens or ""],
+        )
+
+    async def invalidate_users(self, *user_ids):
+        async with self.bot.redis_batch("invalidate_users") as batch:
+            for user_id in user_ids:
+                gen_key, key = self._get_cache_keys(user_id)
+
+                batch.incr(gen_key)
+
+                # Outliving any entry stamped with the previous generation
+                batch.expire(gen_key, USER_CACHE_TIME)
+                batch.unlink(key)
+
+    async def invalidate_all_users(self):
+        # Entries are evicted when they are read or expire
+        await self.bot.redis.incr(USER_GEN_KEY)
 
     @property
     def default_score(self):
@@ -578,79 +800,129 @@ class Mongo(commands.Cog):
 
         return [d async for d in data]
 
+    @AsyncTTL(time_to_live=60, maxsize=1)
+    async def fetch_open_activity_tournaments(self):
+        # Tournaments that haven't been finalized, they are filtered again when used
+        # so that the start and end aren't delayed by the cache
+        return [
+            t
+            for t in await self.fetch_all_tournaments()
+            if isinstance(t, self.ActivityTournament) and not t.is_finalized
+        ]
+
+    async def get_active_activity_tournaments(self):
+        # Tournaments whose standings are updated after each command
+        return [t for t in await self.fetch_open_activity_tournaments() if t.is_active]
+
+    @tracing.traced("mongo.fetch_many_users")
     async def fetch_many_users(self, *user_ids):
+        """Returns read only users, for displaying them"""
         if not user_ids:
             return {}
 
         data = {}
-        not_found = set()
+        not_found = {}  # user_id: generations
 
         # Trying to get as many users as posisble from the cache
-        users = await self.bot.redis.hmget("user", *user_ids)
+        global_gen, *values = await self.bot.redis.mget(
+            USER_GEN_KEY,
+            *[k for _id in user_ids for k in self._get_cache_keys(int(_id))],
+        )
 
-        for _id, u in zip(user_ids, users):
+        for i, _id in enumerate(user_ids):
             _id = int(_id)
 
+            u, gens = self._load_cached_user(
+                _id, global_gen, *values[i * 2 : i * 2 + 2], read_only=True
+            )
+
             if u is None:
-                not_found.add(int(_id))
+                not_found[_id] = gens
             else:
-                data[_id] = self.User.build_from_mongo(pickle.loads(u))
+                data[_id] = u
+
+        metrics.USER_CACHE.inc("hit", amount=len(data))
+        metrics.USER_CACHE.inc("miss", amount=len(not_found))
 
         if not_found:
             # Fetching the rest of the users from the database
-            cursor = self.User.find({"id": {"$in": list(not_found)}})
+            with metrics.MONGO_TIME.time("find_users"):
+                cursor = self.db.users.find({"_id": {"$in": list(not_found)}})
 
-            fetched_users = {u.id: u async for u in cursor}
+                fetched_users = {u["_id"]: self.ReadOnlyUser(u) async for u in cursor}
 
-            self.bot.dispatch("cache_fetched_users", fetched_users)
+            self.bot.dispatch("cache_fetched_users", fetched_users, not_found)
 
             data.update(fetched_users)
 
         return data
 
     @commands.Cog.listener()
-    async def on_cache_fetched_users(self, fetched_users):
-        raw_fetched_users = {
-            _id: pickle.dumps(u.to_mongo()) for _id, u in fetched_users.items()
-        }
-
-        await self.bot.redis.hmset("user", raw_fetched_users)
+    async def on_cache_fetched_users(self, fetched_users, gens):
+        for _id, u in fetched_users.items():
+            await self.cache_user(_id, u.to_mongo(), gens[_id])
 
     async def fetch_user(
-        self, user: Union[discord.User, int, tuple[str, str]], create=False
+        self,
+        user: Union[discord.User, int, tuple[str, str]],
+        create=False,
+        read_only=False,
     ):
+        """read_only: returns a ReadOnlyUser, which is faster to build but can't be changed"""
         # User id
         if isinstance(user, int):
-            return await self.fetch_user_from_query({"id": user}, user_id=user)
+            return await self.fetch_user_from_query(
+                {"id": user}, user_id=user, read_only=read_only
+            )
 
         # name#discriminator
         elif isinstance(user, (list, tuple)):
             return await self.fetch_user_from_query(
-                {"name": user[0], "discriminator": user[1]}
+                {"name": user[0], "discriminator": user[1]}, read_only=read_only
             )
 
         # User object
         else:
             return await self.fetch_user_from_query(
-                {"id": user.id}, user_id=user.id, user=user, create=create
+                {"id": user.id},
+                user_id=user.id,
+                user=user,
+                create=create,
+                read_only=read_only,
             )
 
-    async def fetch_user_from_query(
+    @tracing.traced("mongo.fetch_user")
+    async def fetch_user_from_query(self, query: dict, **kwargs) -> Union[User, None]:
+        with metrics.FETCH_USER_TIME.time():
+            return await self._fetch_user_from_query(query, **kwargs)
+
+    async def _fetch_user_from_query(
         self,
         query: dict,
         *,
         user_id: int = None,
         user: discord.User = None,
         create: bool = False,
+        read_only: bool = False,
     ) -> Union[User, None]:
         if user_id is None:
-            u = None
+            u, gens = None, None
         else:
             # Checking if the user is in the cache
-            u = await self.get_user_from_cache(user_id)
+            u, gens = await self.get_user_from_cache(user_id, read_only)
+
+            metrics.USER_CACHE.inc("miss" if u is None else "hit")
 
         if u is None:
-            u = await self.User.find_one(query)
+            with metrics.MONGO_TIME.time("find_user"):
+                if read_only:
+                    data = await self.User.collection.find_one(
+                        cook_find_filter(self.User, query)
+                    )
+
+                    u = None if data is None else self.ReadOnlyUser(data)
+                else:
+                    u = await self.User.find_one(query)
 
             if u is None:
                 if user is not None and not user.bot:
@@ -678,14 +950,17 @@ class Mongo(commands.Cog):
             current = self.get_current(user)
 
             # Checking if user info needs to be updated
-            if current.values() != [u.name, u.discriminator, u.avatar]:
+            if list(current.values()) != [u.name, u.discriminator, u.avatar]:
                 await self.update_user(user.id, {"$set": current})
                 uj.update(current)
 
-            u = self.User.build_from_mongo(uj)
+                # The update invalidated the entry, so the generations have to be read again
+                gens = await self.get_cache_gens(user.id)
+
+            u = self._build_user(uj, read_only)
 
         # Updating in cache
-        await self.bot.redis.hset("user", u.id, pickle.dumps(uj))
+        await self.cache_user(u.id, uj, gens)
 
         return u
 
@@ -730,6 +1005,8 @@ class Mongo(commands.Cog):
 
         # Resetting the user's data
 
+        averages = get_sketch_averages(user)
+
         meta_data = _get_meta_data(user)
 
         # Resetting the user's account
@@ -746,9 +1023,14 @@ class Mongo(commands.Cog):
         await self.replace_user_data(user)
 
         # Removing the user from the leaderboard
-        for lb in self.bot.lbs:
-            for stat in lb.stats:
-                await stat.remove_user(user.id)
+        async with self.bot.redis_batch("wipe_user") as batch:
+            for lb in self.bot.lbs:
+                for stat in lb.stats:
+                    stat.queue_remove_user(batch, user.id)
+
+            if averages is not None:
+                for sketch, value in zip(self.bot.avg_sketches, averages):
+                    sketch.queue_move(batch, old=value)
 
     async def restore_user(self, user):
         backup = await self.UserBackup.find_one({"id": user.id})
@@ -767,16 +1049,19 @@ class Mongo(commands.Cog):
 
         return user, backup
 
+    @tracing.traced("mongo.update_user")
     async def update_user(self, user, query: dict):
         if isinstance(user, int):
             user_id = user
         else:
             user_id = user.id
 
-        await self.db.users.update_one({"_id": user_id}, query)
+        with metrics.MONGO_TIME.time("update_user"):
+            await self.db.users.update_one({"_id": user_id}, query)
 
-        await self.bot.redis.hdel("user", user_id)
+        await self.invalidate_users(user_id)
 
+    @tracing.traced("mongo.replace_user_data")
     async def replace_user_data(self, new_user, member=None):
         if member is not None:
             current = self.get_current(member)
@@ -784,16 +1069,15 @@ class Mongo(commands.Cog):
             new_user.update(current)
 
         try:
-            await new_user.commit()
+            with metrics.MONGO_TIME.time("replace_user"):
+                await new_user.commit()
         except pymongo.errors.DuplicateKeyError:
             pass
         except exceptions.UpdateError:
-            await self.bot.redis.hdel("user", new_user.id)
+            await self.invalidate_users(new_user.id)
         else:
             # Caching new user data
-            await self.bot.redis.hset(
-                "user", new_user.id, pickle.dumps(new_user.to_mongo())
-            )
+            await self.cache_user(new_user.id, new_user.to_mongo())
 
     @AsyncTTL(time_to_live=10 * 60, maxsize=32)
     async def get_info_data(self, info_id: str):
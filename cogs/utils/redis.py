@@ -1,10 +1,45 @@
+from collections import Counter, defaultdict
+
 from discord.ext import commands
 from redis import asyncio as aioredis
 
+import helpers.metrics as metrics
+import helpers.tracing as tracing
 from bot import WordPractice
 from config import REDIS_URL
 
 
+class Batch:
+    """Queues redis commands and sends them in a single round trip when the block exits"""
+
+    def __init__(self, cog: "Redis", name: str, transaction: bool):
+        self.cog = cog
+        self.name = name
+
+        self.pipe = cog.pool.pipeline(transaction=transaction)
+        self.results = None
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, *_):
+        try:
+            if exc_type is None:
+                commands_amt = len(self.pipe.command_stack)
+
+                with metrics.REDIS_BATCH_TIME.time(self.name), tracing.span(
+                    f"redis.{self.name}", commands=commands_amt
+                ):
+                    self.results = await self.pipe.execute()
+
+                self.cog.record_batch(self.name, commands_amt)
+        finally:
+            await self.pipe.reset()
+
+
 class Redis(commands.Cog):
     def __init__(self, bot: WordPractice):
         self.bot = bot
@@ -12,6 +47,9 @@ class Redis(commands.Cog):
         self.pool = None
         self._connect_task = self.bot.loop.create_task(self.connect())
 
+        # Statistics for each batch {name: {calls, commands, round_trips}}
+        self.batch_stats = defaultdict(Counter)
+
     async def connect(self):
         self.pool = await aioredis.from_url(
             REDIS_URL, socket_timeout=10, max_connections=20
@@ -20,6 +58,18 @@ class Redis(commands.Cog):
     async def wait_until_ready(self):
         await self._connect_task
 
+    def batch(self, name: str, *, transaction: bool = False):
+        return Batch(self, name, transaction)
+
+    def record_batch(self, name: str, commands_amt: int):
+        stats = self.batch_stats[name]
+
+        stats["calls"] += 1
+
+        # Round trips that would have been made without batching
+        stats["commands"] += commands_amt
+        stats["round_trips"] += 1
+
 
 def setup(bot: WordPractice):
     bot.add_cog(Redis(bot))
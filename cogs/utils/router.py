@@ -0,0 +1,30 @@
+from discord.ext import commands
+
+import helpers.tracing as tracing
+from bot import WordPractice
+from helpers.router import MessageRouter
+
+
+class Router(commands.Cog):
+    """Routes messages to the tests waiting for input"""
+
+    def __init__(self, bot: WordPractice):
+        self.bot = bot
+
+        self.router = MessageRouter()
+
+    @tracing.traced()
+    async def wait_for_message(self, ctx, author_id: int = None, timeout=None):
+        """Waits for a message from the author (or another user) in the context's channel"""
+        if author_id is None:
+            author_id = ctx.author.id
+
+        return await self.router.wait_for(ctx.channel.id, author_id, timeout)
+
+    @commands.Cog.listener()
+    async def on_message(self, message):
+        self.router.dispatch(message)
+
+
+def setup(bot: WordPractice):
+    bot.add_cog(Router(bot))
@@ -0,0 +1,56 @@
+import json
+
+from discord.ext import commands, tasks
+
+import helpers.tracing as tracing
+from bot import WordPractice
+from config import TRACE_FILE, TRACE_OTLP_URL
+from data.constants import TRACE_FLUSH_INTERVAL, TRACE_SAMPLE_RATE
+
+
+def _write_spans(path: str, spans: list):
+    with open(path, "a") as f:
+        f.writelines(json.dumps(s.to_dict()) + "\n" for s in spans)
+
+
+class Tracing(commands.Cog):
+    """Exports the sampled command traces to a file and/or an OTLP collector"""
+
+    def __init__(self, bot: WordPractice):
+        self.bot = bot
+
+        if TRACE_FILE or TRACE_OTLP_URL:
+            tracing.sample_rate = TRACE_SAMPLE_RATE
+
+            self.export_spans.start()
+
+    def cog_unload(self):
+        tracing.sample_rate = 0
+
+        self.export_spans.cancel()
+
+    @tasks.loop(seconds=TRACE_FLUSH_INTERVAL)
+    async def export_spans(self):
+        spans = tracing.take_finished()
+
+        if not spans:
+            return
+
+        for s in spans:
+            s.set(cluster=self.bot.cluster_id)
+
+        if TRACE_FILE:
+            await self.bot.loop.run_in_executor(None, _write_spans, TRACE_FILE, spans)
+
+        if TRACE_OTLP_URL:
+            data = tracing.to_otlp(spans, {"service.name": "wordpractice"})
+
+            try:
+                async with self.bot.session.post(TRACE_OTLP_URL, json=data) as r:
+                    r.raise_for_status()
+            except Exception:
+                self.bot.log.exception("Failed to send traces to the collector")
+
+
+def setup(bot: WordPractice):
+    bot.add_cog(Tracing(bot))
@@ -0,0 +1,31 @@
+import traceback
+
+from discord.ext import commands
+
+from bot import WordPractice
+from helpers.watchdog import LoopWatchdog
+
+
+class Watchdog(commands.Cog):
+    """Logs the functions that block the event loop"""
+
+    def __init__(self, bot: WordPractice):
+        self.bot = bot
+
+        self.watchdog = LoopWatchdog(self.on_stall)
+        self._task = self.bot.loop.create_task(self.watchdog.run())
+
+    def cog_unload(self):
+        self._task.cancel()
+
+    def on_stall(self, lag: float, culprit: str, stack):
+        message = f"Event loop blocked for {lag * 1000:.0f}ms by {culprit}"
+
+        if stack is not None:
+            message += "\n" + "".join(traceback.format_list(stack[-8:])).rstrip()
+
+        self.bot.log.warning(message)
+
+
+def setup(bot: WordPractice):
+    bot.add_cog(Watchdog(bot))
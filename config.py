@@ -19,6 +19,17 @@ DEBUG_GUILD_ID = config("DEBUG_GUILD_ID", cast=int)
 
 TESTING = config("TESTING", cast=bool, default=False)
 
+# Clustering (0 shards uses the amount recommended by Discord)
+CLUSTER_COUNT = config("CLUSTER_COUNT", cast=int, default=1)
+SHARD_COUNT = config("SHARD_COUNT", cast=int, default=0)
+
+# Metrics are served on METRICS_PORT + the cluster id (0 disables them)
+METRICS_PORT = config("METRICS_PORT", cast=int, default=0)
+
+# Sampled command traces are written to TRACE_FILE (json lines) and/or sent to an OTLP/HTTP collector
+TRACE_FILE = config("TRACE_FILE", default=None)
+TRACE_OTLP_URL = config("TRACE_OTLP_URL", default=None)
+
 DBL_TOKEN = config("DBL_TOKEN", default=None)
 GRAPH_CDN_SECRET = config("GRAPH_CDN_SECRET")
 
@@ -21,21 +21,58 @@ DEFAULT_VIEW_TIMEOUT = 45  # seconds
 DEFAULT_THEME = default["Material"]["colours"]
 AUTO_MODERATOR_NAME = "Thomas Worker 99"  # :)
 
+# Clustering
+CLUSTER_STATS_EXPIRE_TIME = 900  # seconds
+CLUSTER_RESTART_DELAY = (5, 300)  # seconds, doubles after each crash up to the maximum
+LEADER_LEASE_TIME = 30  # seconds
+
+# Background tasks
+TASK_HISTORY_AMT = 50  # runs kept for each task
+TASK_CHECK_INTERVAL = 60  # seconds between checking if a background task is due
+JOB_CHUNK_SIZE = 1000  # documents
+
+# Caching
+USER_CACHE_TIME = 3600  # seconds
+
+# Webhook logs
+LOG_QUEUE_SIZE = 1000  # embeds waiting to be sent for each webhook
+LOG_FLUSH_INTERVAL = 5  # seconds
+
+# Event loop watchdog
+LOOP_LAG_INTERVAL = 0.1  # seconds between heartbeats
+LOOP_LAG_THRESHOLD = 0.25  # seconds of lag before the loop is considered blocked
+
+# Tracing
+TRACE_SAMPLE_RATE = 0.05  # portion of the commands that are traced
+TRACE_BUFFER_SIZE = 10000  # finished spans waiting to be exported
+TRACE_FLUSH_INTERVAL = 10  # seconds
+
+# Typing averages
 AVG_AMT = 10
+CONSISTENCY_AMT = 30  # tests in the consistency achievement
+AVG_PERC_INTERVAL = 1  # minutes between reading the average percentiles
 
 # Leaderboards
 LB_LENGTH = 1000
 LB_DISPLAY_AMT = 100
+LB_REBUILD_BATCH = 250  # entries per zadd when rebuilding
+LB_STAGING_EXPIRE_TIME = (
+    600  # seconds, for staging keys left behind by a stopped rebuild
+)
+LB_PAGE_CACHE_TIME = 60  # seconds
 
 UPDATE_24_HOUR_INTERVAL = 10  # minutes
 
 # Achievements
 ACHIEVEMENTS_SHOWN = 4
+ACHIEVEMENT_INPUTS_AMT = 10000  # users whose achievement inputs are remembered
 
 # Typing test
 MAX_RACE_JOIN = 10
 RACE_JOIN_EXPIRE_TIME = 120  # seconds
 TEST_EXPIRE_TIME = 180  # seconds
+SPAM_STRIKE_EXPIRE_TIME = 3600  # seconds
+CMDS_RUN_EXPIRE_TIME = 86400 * 7  # seconds
 TEST_RANGE = (1, 100)
 TEST_ZONES = {"short": range(10, 21), "medium": range(21, 51), "long": range(51, 101)}
 TEST_LOAD_TIME = 5
@@ -0,0 +1,60 @@
+from data.constants import LB_LENGTH
+from helpers.user import RING_24H_SIZE, TOTAL_24H_INTERVALS, get_24h_interval
+
+
+class FieldAggregation:
+    """Ranks users by a stored field, backed by a descending index on that field"""
+
+    def __init__(self, field: str):
+        self.field = field
+
+    @property
+    def index(self):
+        return [(self.field, -1)]
+
+    def pipeline(self, limit: int = LB_LENGTH):
+        return [
+            {"$sort": {self.field: -1}},
+            {"$limit": limit},
+            {"$project": {"value": f"${self.field}"}},
+        ]
+
+
+class Rolling24hAggregation:
+    """Ranks users by the sum of a 24 hour stat, the difference of two totals of the RollingStat ring"""
+
+    def __init__(self, field: str):
+        self.field = field
+
+    @property
+    def index(self):
+        return [(f"{self.field}.head", -1)]
+
+    def pipeline(self, limit: int = LB_LENGTH, include_ring: bool = False):
+        """include_ring also returns the ring of each user, to split the sum into its intervals"""
+        start = get_24h_interval() - TOTAL_24H_INTERVALS + 1
+
+        values = f"${self.field}.values"
+
+        return [
+            # Users who haven't added anything in the last day have nothing left in their window
+            {"$match": {f"{self.field}.head": {"$gte": start}}},
+            {
+                "$project": {
+                    "value": {
+                        "$subtract": [
+                            {
+                                "$arrayElemAt": [
+                                    values,
+                                    {"$mod": [f"${self.field}.head", RING_24H_SIZE]},
+                                ]
+                            },
+                            {"$arrayElemAt": [values, (start - 1) % RING_24H_SIZE]},
+                        ]
+                    },
+                    **({"ring": f"${self.field}"} if include_ring else {}),
+                }
+            },
+            {"$sort": {"value": -1}},
+            {"$limit": limit},
+        ]
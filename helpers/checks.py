@@ -39,30 +39,8 @@ def cooldown(regular: int, premium: int):
         # Cooldown key
         c = (ctx.author.id, get_command_name(ctx.command))
 
-        # Checking if there is a cooldown
-        cooldown = ctx.bot.cooldowns.get(c)
-
         user = ctx.initial_user
 
-        if cooldown:
-            # Checking if cooldown has expired
-            if time.time() <= cooldown:
-                embed = ctx.error_embed(
-                    title="Command On Cooldown",
-                    description=f"Try again in **{round(abs(time.time() - cooldown), 2)}** seconds",
-                )
-
-                if user.is_premium is False and regular > premium:
-                    embed.description += f"\n\n**[Premium Members]({PREMIUM_LINK})** only wait **{premium}s** instead of **{regular}s**!"
-
-                    view = create_link_view({"Upgrade": PREMIUM_LINK})
-                else:
-                    view = None
-
-                await ctx.respond(embed=embed, view=view)
-
-                return False
-
         # Giving cooldown based off account type
 
         c_time = time.time()
@@ -72,22 +50,43 @@ def cooldown(regular: int, premium: int):
         else:
             c_time += regular
 
-        ctx.bot.cooldowns[c] = c_time
+        # Checking if there is a cooldown that hasn't expired, otherwise starting one
+        cooldown = await ctx.bot.cooldowns.add(c, c_time)
+
+        if cooldown:
+            embed = ctx.error_embed(
+                title="Command On Cooldown",
+                description=f"Try again in **{round(abs(time.time() - cooldown), 2)}** seconds",
+            )
+
+            if user.is_premium is False and regular > premium:
+                embed.description += f"\n\n**[Premium Members]({PREMIUM_LINK})** only wait **{premium}s** instead of **{regular}s**!"
+
+                view = create_link_view({"Upgrade": PREMIUM_LINK})
+            else:
+                view = None
+
+            await ctx.respond(embed=embed, view=view)
+
+            return False
 
         return True
 
     return commands.check(predicate)
 
 
-async def user_check(ctx: Context, user: "User"):
-    """Handles the user inputted and fetches user"""
+async def user_check(ctx: Context, user: "User", read_only: bool = True):
+    """
+    Handles the user inputted and fetches user
+    read_only: the user is only displayed (see Mongo.fetch_user)
+    """
     if isinstance(user, (discord.User, discord.Member)) and user.bot:
         raise commands.BadArgument("`Beep boop!` That user is a bot :robot:")
 
     if user is None:
         user = ctx.initial_user
     else:
-        user = await ctx.bot.mongo.fetch_user(user)
+        user = await ctx.bot.mongo.fetch_user(user, read_only=read_only)
 
     if user is None:
         raise commands.BadArgument(
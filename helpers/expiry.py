@@ -0,0 +1,70 @@
+import heapq
+import time
+from collections import Counter
+
+
+class ExpiringMap:
+    """
+    Maps keys to an expiry timestamp, keeping a heap ordered by expiry
+
+    Expired keys are removed lazily whenever the map is accessed
+    """
+
+    def __init__(self):
+        self._expires = {}  # key: timestamp
+        self._heap = []  # (timestamp, key)
+
+        # Statistics {set, removed, expired}
+        self.stats = Counter()
+
+    def __len__(self):
+        self.expire()
+
+        return len(self._expires)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        self.expire()
+
+        return self._expires.get(key)
+
+    def set(self, key, timestamp: float):
+        self.expire()
+
+        self._expires[key] = timestamp
+        heapq.heappush(self._heap, (timestamp, key))
+
+        self.stats["set"] += 1
+
+        # Entries that were replaced or removed are still in the heap
+        if len(self._heap) > 2 * len(self._expires) + 64:
+            self._compact()
+
+    def remove(self, key):
+        if self._expires.pop(key, None) is not None:
+            self.stats["removed"] += 1
+
+    def expire(self, now: float = None):
+        now = time.time() if now is None else now
+
+        while self._heap and self._heap[0][0] <= now:
+            timestamp, key = heapq.heappop(self._heap)
+
+            # Skipping entries that are outdated
+            if self._expires.get(key) == timestamp:
+                del self._expires[key]
+                self.stats["expired"] += 1
+
+    def _compact(self):
+        self._heap = [(t, k) for k, t in self._expires.items()]
+        heapq.heapify(self._heap)
+
+    @property
+    def metrics(self):
+        return {
+            "size": len(self._expires),
+            "heap_size": len(self._heap),
+            **self.stats,
+        }
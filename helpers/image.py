@@ -9,6 +9,7 @@ from PIL import Image, ImageDraw, ImageFilter
 from data.constants import SIDE_BORDER, SPACING, STATIC_IMAGE_FORMAT, TOP_BORDER
 from static.assets import achievement_base, arial, uni_sans_heavy
 
+from .tracing import traced
 from .utils import run_in_executor
 
 
@@ -194,6 +195,7 @@ def get_pacer(base, text_colour, quote, word_list, pacer, pacer_type):
     return buffer
 
 
+@traced()
 def save_discord_static_img(img, name, quantize=True, optimize=True):
     buffer = BytesIO()
 
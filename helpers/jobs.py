@@ -0,0 +1,134 @@
+import pickle
+import time
+
+from data.constants import JOB_CHUNK_SIZE
+
+
+class MaintenanceJob:
+    """
+    Processes the documents of a collection in chunks ordered by _id
+
+    Progress is saved in redis after every chunk, so a job that is interrupted
+    resumes from the last chunk with the same start time the next time it is run
+
+    Jobs are run by the cluster holding the lease, which is checked before every chunk
+
+    get_query: (started) -> filter for the documents to process
+    process: async (documents, started) -> None, must be safe to repeat for a chunk
+    """
+
+    def __init__(
+        self,
+        bot,
+        name: str,
+        collection: str,
+        get_query,
+        process,
+        *,
+        projection: dict = None,
+        chunk_size: int = JOB_CHUNK_SIZE,
+    ):
+        self.bot = bot
+        self.name = name
+        self.collection = collection
+
+        self.get_query = get_query
+        self.process = process
+
+        self.projection = projection or {"_id": 1}
+        self.chunk_size = chunk_size
+
+        self.running = False
+
+    @property
+    def checkpoint_key(self):
+        return f"job.{self.name}"
+
+    async def get_checkpoint(self):
+        data = await self.bot.redis.hgetall(self.checkpoint_key)
+
+        if not data:
+            return None
+
+        return (
+            float(data[b"started"]),
+            pickle.loads(data[b"last_id"]),
+            int(data[b"processed"]),
+        )
+
+    async def run(self, token: int):
+        """
+        Runs the job or resumes it from its checkpoint, returns the amount of documents processed
+
+        Raises LeaseLost if the lease isn't held with the token anymore
+        """
+        if self.running:
+            return 0
+
+        self.running = True
+
+        try:
+            return await self._run(token)
+        finally:
+            self.running = False
+
+    async def _run(self, token: int):
+        collection = self.bot.mongo.db[self.collection]
+
+        checkpoint = await self.get_checkpoint()
+
+        if checkpoint is None:
+            started, last_id, processed = time.time(), None, 0
+        else:
+            started, last_id, processed = checkpoint
+
+            self.bot.log.info(f"Resuming job {self.name} after {processed} documents")
+
+        query = self.get_query(started)
+
+        timer = time.perf_counter()
+        resumed_at = processed
+
+        while True:
+            # Stopping before another cluster could be running the job as well
+            await self.bot.leader.check(token)
+
+            chunk_query = (
+                query if last_id is None else {**query, "_id": {"$gt": last_id}}
+            )
+
+            cursor = (
+                collection.find(chunk_query, self.projection)
+                .sort("_id", 1)
+                .limit(self.chunk_size)
+            )
+
+            docs = [d async for d in cursor]
+
+            if not docs:
+                break
+
+            await self.process(docs, started)
+
+            processed += len(docs)
+            last_id = docs[-1]["_id"]
+
+            await self.bot.redis.hset(
+                self.checkpoint_key,
+                mapping={
+                    "started": started,
+                    "last_id": pickle.dumps(last_id),
+                    "processed": processed,
+                },
+            )
+
+        await self.bot.redis.delete(self.checkpoint_key)
+
+        elapsed = time.perf_counter() - timer
+        rate = (processed - resumed_at) / elapsed if elapsed else 0
+
+        self.bot.log.info(
+            f"Job {self.name} processed {processed} documents ({rate:.0f}/s)"
+        )
+
+        return processed
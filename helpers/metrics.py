@@ -0,0 +1,202 @@
+"""Counters and histograms rendered in the Prometheus text format"""
+
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Every metric that is rendered
+_metrics = []
+
+# Functions returning extra samples [(name, labels, value)] when the metrics are rendered
+_collectors = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict):
+    if not labels:
+        return ""
+
+    values = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+    return "{" + values + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+
+        _metrics.append(self)
+
+    def _get_labels(self, values: tuple):
+        return dict(zip(self.labels, values))
+
+    def render(self):
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+
+        yield from self.samples()
+
+    def samples(self):
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.values = defaultdict(float)
+
+    def inc(self, *labels, amount: float = 1):
+        self.values[labels] += amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self._get_labels(labels))} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        self.values[labels] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.values[labels] -= amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.buckets = buckets
+
+        # labels: [count for each bucket (+Inf last), sum]
+        self.values = {}
+
+    def observe(self, *labels, value: float):
+        if (data := self.values.get(labels)) is None:
+            data = self.values[labels] = [[0] * (len(self.buckets) + 1), 0]
+
+        data[0][bisect_left(self.buckets, value)] += 1
+        data[1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(*labels, value=time.perf_counter() - start)
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            label_dict = self._get_labels(labels)
+
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+
+                bucket_labels = _format_labels(label_dict | {"le": bound})
+
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+
+            yield f"{self.name}_sum{_format_labels(label_dict)} {total}"
+            yield f"{self.name}_count{_format_labels(label_dict)} {cumulative}"
+
+
+def add_collector(collector):
+    """collector: function returning [(name, labels, value)] of gauges that are read when rendering"""
+    _collectors.append(collector)
+
+
+def remove_collector(collector):
+    _collectors.remove(collector)
+
+
+def render(constant_labels: dict = None):
+    lines = []
+
+    for m in _metrics:
+        lines += m.render()
+
+    for collector in _collectors:
+        for name, labels, value in collector():
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    if constant_labels:
+        lines = [_add_labels(line, constant_labels) for line in lines]
+
+    return "\n".join(lines) + "\n"
+
+
+def _add_labels(line: str, labels: dict):
+    if line.startswith("#"):
+        return line
+
+    name, value = line.rsplit(" ", 1)
+
+    extra = _format_labels(labels)[1:-1]
+
+    if name.endswith("}"):
+        return f"{name[:-1]},{extra}}} {value}"
+
+    return f"{name}{{{extra}}} {value}"
+
+
+# Metrics that are recorded throughout the bot
+
+COMMAND_TIME = Histogram(
+    "wordpractice_command_seconds",
+    "Time spent handling a command",
+    ("type", "command"),
+)
+FETCH_USER_TIME = Histogram(
+    "wordpractice_fetch_user_seconds", "Time spent fetching a user"
+)
+USER_CACHE = Counter("wordpractice_user_cache_total", "User cache lookups", ("result",))
+MONGO_TIME = Histogram(
+    "wordpractice_mongo_seconds", "Time spent in mongo queries", ("operation",)
+)
+REDIS_BATCH_TIME = Histogram(
+    "wordpractice_redis_batch_seconds", "Round trip time of redis batches", ("batch",)
+)
+EXECUTOR_TIME = Histogram(
+    "wordpractice_executor_seconds",
+    "Time spent running functions in the executor, including waiting",
+    ("function",),
+)
+EXECUTOR_PENDING = Gauge(
+    "wordpractice_executor_pending", "Functions waiting for or running in the executor"
+)
+TASK_TIME = Histogram(
+    "wordpractice_task_seconds", "Time spent running a background task", ("task",)
+)
+TASK_ERRORS = Counter(
+    "wordpractice_task_errors_total", "Background task runs that failed", ("task",)
+)
+LOOP_LAG = Histogram(
+    "wordpractice_loop_lag_seconds",
+    "How late the event loop woke up from a short sleep",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LOOP_STALLS = Counter(
+    "wordpractice_loop_stalls_total",
+    "Times the event loop was blocked, by the function blamed",
+    ("function",),
+)
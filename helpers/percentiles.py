@@ -0,0 +1,75 @@
+from math import floor
+
+from helpers.user import get_typing_average
+
+
+class PercentileSketch:
+    """
+    Fixed width histogram of the typing averages stored in a redis hash {bucket: count}
+
+    Unlike a t-digest, a user's previous average can be removed when it changes
+    """
+
+    def __init__(self, name: str, width: float):
+        self.name = name
+        self.width = width
+
+    @property
+    def key(self):
+        return f"perc.{self.name}"
+
+    def get_bucket(self, value: float) -> int:
+        return floor(value / self.width)
+
+    def queue_move(self, pipe, old: float = None, new: float = None):
+        if old is not None and new is not None:
+            if self.get_bucket(old) == self.get_bucket(new):
+                return
+
+        if old is not None:
+            pipe.hincrby(self.key, self.get_bucket(old), -1)
+
+        if new is not None:
+            pipe.hincrby(self.key, self.get_bucket(new), 1)
+
+    def build(self, values) -> dict[int, int]:
+        counts = {}
+
+        for v in values:
+            bucket = self.get_bucket(v)
+            counts[bucket] = counts.get(bucket, 0) + 1
+
+        return counts
+
+    def get_percentiles(self, raw_counts: dict, percentiles: list[float]):
+        # Decrements that were applied before a backfill can leave negative counts
+        counts = sorted((int(b), int(c)) for b, c in raw_counts.items() if int(c) > 0)
+
+        total = sum(c for _, c in counts)
+
+        if total == 0:
+            return None
+
+        result = []
+
+        for p in percentiles:
+            rank = p / 100 * total
+            seen = 0
+
+            for bucket, count in counts:
+                if seen + count >= rank:
+                    # Assuming the values are spread evenly in the bucket
+                    result.append((bucket + (rank - seen) / count) * self.width)
+                    break
+
+                seen += count
+
+        return result
+
+
+def get_sketch_averages(user):
+    """Values that a user contributes to the sketches, None if they have no scores"""
+    if user is None or len(user.scores) == 0:
+        return None
+
+    return get_typing_average(user)[:3]
@@ -0,0 +1,203 @@
+"""Read only views of raw documents that skip building umongo documents"""
+
+import copy
+
+from marshmallow import missing
+from marshmallow.fields import Field
+from umongo.fields import DictField, EmbeddedField, ListField
+
+# Read model of each registered document class
+_models = {}
+
+
+class ReadModel:
+    """Read only document that only converts a field when it is first read"""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self._data.get('_id')}>"
+
+    def to_mongo(self):
+        return self._data
+
+
+class RawField:
+    """Field that is used as it is stored"""
+
+    __slots__ = ("key", "default")
+
+    def __init__(self, key: str, default):
+        self.key = key
+        self.default = default
+
+    def get_default(self):
+        if callable(self.default):
+            return self.default()
+
+        # Each document gets its own copy of a mutable default, as plain containers like the stored data
+        if isinstance(self.default, dict):
+            return copy.deepcopy(dict(self.default))
+
+        if isinstance(self.default, list):
+            return copy.deepcopy(list(self.default))
+
+        return self.default
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        value = obj._data.get(self.key, missing)
+
+        return self.get_default() if value is missing else value
+
+
+class LazyField(RawField):
+    """Field with embedded documents, converted once and kept in a slot"""
+
+    __slots__ = ("slot", "convert")
+
+    def __init__(self, key: str, default, slot, convert):
+        super().__init__(key, default)
+
+        self.slot = slot
+        self.convert = convert
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        try:
+            return self.slot.__get__(obj)
+        except AttributeError:
+            pass
+
+        value = obj._data.get(self.key, missing)
+
+        if value is missing:
+            value = self.get_default()
+        elif value is not None:
+            value = self.convert(value)
+
+        self.slot.__set__(obj, value)
+
+        return value
+
+
+class InstanceAttribute:
+    """Attribute that the template sets on documents (like User.lb_snapshot), kept in a slot"""
+
+    __slots__ = ("slot", "default")
+
+    def __init__(self, slot, default):
+        self.slot = slot
+        self.default = default
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        try:
+            return self.slot.__get__(obj)
+        except AttributeError:
+            return self.default
+
+    def __set__(self, obj, value):
+        self.slot.__set__(obj, value)
+
+
+def _is_instance_attribute(value):
+    """Class attributes that hold values rather than methods or properties"""
+    return not callable(value) and not hasattr(value, "__get__")
+
+
+def _get_converter(field):
+    """Returns a function converting the stored value of the field or None if it is used as it is"""
+    if isinstance(field, EmbeddedField):
+        return get_read_model(field.embedded_document_cls)
+
+    if isinstance(field, ListField):
+        inner = _get_converter(field.inner)
+
+        if inner is not None:
+            return lambda value: [inner(v) for v in value]
+
+    if isinstance(field, DictField) and field.value_field is not None:
+        inner = _get_converter(field.value_field)
+
+        if inner is not None:
+            return lambda value: {k: inner(v) for k, v in value.items()}
+
+    return None
+
+
+def get_read_model(document_cls):
+    """
+    Generates a read only class from a registered document class (once)
+    The properties and methods of its templates are copied, writing to a field raises an AttributeError
+    """
+    if (model := _models.get(document_cls)) is not None:
+        return model
+
+    template = document_cls.opts.template
+
+    nmspc = {}
+    attributes = {}  # name: default
+
+    # Parents first so that the children override them
+    for t in reversed(template.__mro__):
+        if t is object or t.__module__.startswith("umongo"):
+            continue
+
+        for k, v in t.__dict__.items():
+            # Fields are replaced below, User.__setattr__ and the like aren't needed
+            if k == "Meta" or isinstance(v, Field) or k.startswith("__"):
+                continue
+
+            # Writable on the documents, so they need a slot
+            if _is_instance_attribute(v):
+                attributes[k] = v
+                nmspc.pop(k, None)
+            else:
+                attributes.pop(k, None)
+                nmspc[k] = v
+
+    lazy = {}
+
+    for name, field in document_cls.schema.fields.items():
+        key = field.attribute or name
+        default = None if field.default is missing else field.default
+
+        convert = _get_converter(field)
+
+        if convert is None:
+            nmspc[name] = RawField(key, default)
+        else:
+            lazy[name] = (key, default, convert)
+
+    nmspc["__slots__"] = tuple(f"_{name}_value" for name in (*lazy, *attributes))
+    nmspc["bot"] = getattr(document_cls, "bot", None)
+
+    model = type(f"ReadOnly{template.__name__}", (ReadModel,), nmspc)
+
+    # Slots only exist once the class is created
+    for name, (key, default, convert) in lazy.items():
+        slot = model.__dict__[f"_{name}_value"]
+
+        setattr(model, name, LazyField(key, default, slot, convert))
+
+    for name, default in attributes.items():
+        slot = model.__dict__[f"_{name}_value"]
+
+        setattr(model, name, InstanceAttribute(slot, default))
+
+    _models[document_cls] = model
+
+    return model
@@ -0,0 +1,48 @@
+import asyncio
+from collections import Counter
+
+
+class MessageRouter:
+    """Resolves the tasks waiting for a message by (channel_id, author_id) instead of checking each one"""
+
+    def __init__(self):
+        self.waiters = {}  # (channel_id, author_id): [futures]
+
+        # Statistics {messages, resolved}
+        self.stats = Counter()
+
+    def __len__(self):
+        return sum(len(w) for w in self.waiters.values())
+
+    async def wait_for(self, channel_id: int, author_id: int, timeout: float = None):
+        key = (channel_id, author_id)
+
+        future = asyncio.get_running_loop().create_future()
+
+        self.waiters.setdefault(key, []).append(future)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            waiters = self.waiters.get(key)
+
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+
+                if not waiters:
+                    del self.waiters[key]
+
+    def dispatch(self, message):
+        self.stats["messages"] += 1
+
+        waiters = self.waiters.pop((message.channel.id, message.author.id), None)
+
+        if waiters is None:
+            return
+
+        # Every task waiting for the user in the channel gets the message
+        for future in waiters:
+            if not future.done():
+                future.set_result(message)
+                self.stats["resolved"] += 1
@@ -0,0 +1,278 @@
+import time
+
+from helpers.expiry import ExpiringMap
+
+# Sets the key if it doesn't exist, otherwise returns the current value
+ADD_SCRIPT = """
+local current = redis.call("GET", KEYS[1])
+
+if current then
+    return current
+end
+
+redis.call("SET", KEYS[1], ARGV[1], "PX", ARGV[2])
+
+return false
+"""
+
+# Counts a use in the current window, returns the amount of strikes if the limit is exceeded
+RATE_LIMIT_SCRIPT = """
+local count = redis.call("INCR", KEYS[1])
+
+if count == 1 then
+    redis.call("PEXPIRE", KEYS[1], ARGV[1])
+end
+
+if count <= tonumber(ARGV[2]) then
+    redis.call("DEL", KEYS[2])
+    return 0
+end
+
+local strikes = redis.call("INCR", KEYS[2])
+redis.call("EXPIRE", KEYS[2], ARGV[3])
+
+return strikes
+"""
+
+
+def _format_key(key):
+    if isinstance(key, tuple):
+        return ".".join(str(k) for k in key)
+
+    return str(key)
+
+
+class SharedExpiringMap:
+    """
+    Expiring timestamps that are shared between processes as redis keys
+
+    cache_remote: whether values set by other processes can be served locally
+    Only safe when keys are never removed before they expire
+    """
+
+    def __init__(self, bot, prefix: str, *, cache_remote: bool = False):
+        self.bot = bot
+        self.prefix = prefix
+        self.cache_remote = cache_remote
+
+        # Keys that are known to be set, used to skip redis for hot keys
+        self.local = ExpiringMap()
+
+        self._add_script = None
+
+    def get_key(self, key):
+        return f"{self.prefix}.{_format_key(key)}"
+
+    async def get(self, key):
+        if (timestamp := self.local.get(key)) is not None:
+            return timestamp
+
+        value = await self.bot.redis.get(self.get_key(key))
+
+        if value is None:
+            return None
+
+        timestamp = float(value)
+
+        if self.cache_remote:
+            self.local.set(key, timestamp)
+
+        return timestamp
+
+    async def add(self, key, timestamp: float):
+        """Sets the key if it isn't already set, returns the current timestamp otherwise"""
+        if (current := self.local.get(key)) is not None:
+            return current
+
+        if self._add_script is None:
+            self._add_script = self.bot.redis.register_script(ADD_SCRIPT)
+
+        px = max(int((timestamp - time.time()) * 1000), 1)
+
+        current = await self._add_script(keys=[self.get_key(key)], args=[timestamp, px])
+
+        if current is None:
+            self.local.set(key, timestamp)
+            return None
+
+        timestamp = float(current)
+
+        if self.cache_remote:
+            self.local.set(key, timestamp)
+
+        return timestamp
+
+    async def remove(self, key):
+        # Keys that weren't added by this process are left to the process that owns them
+        if key not in self.local:
+            return
+
+        self.local.remove(key)
+
+        await self.bot.redis.delete(self.get_key(key))
+
+
+class SharedRateLimit:
+    """Fixed window rate limit shared between processes, counts strikes for going over it"""
+
+    def __init__(self, bot, prefix: str, rate: int, per: float, strike_expire: int):
+        self.bot = bot
+        self.prefix = prefix
+
+        self.rate = rate
+        self.per = per
+        self.strike_expire = strike_expire
+
+        self._script = None
+
+    async def hit(self, key) -> int:
+        """Returns the amount of times the key has gone over the limit in a row"""
+        if self._script is None:
+            self._script = self.bot.redis.register_script(RATE_LIMIT_SCRIPT)
+
+        key = _format_key(key)
+
+        return await self._script(
+            keys=[f"{self.prefix}.{key}", f"{self.prefix}.strikes.{key}"],
+            args=[int(self.per * 1000), self.rate, self.strike_expire],
+        )
+
+    async def reset(self, key):
+        await self.bot.redis.delete(f"{self.prefix}.strikes.{_format_key(key)}")
+
+
+# Renews the lease if it is owned by this process, otherwise takes it with a new fencing token if it is free
+ACQUIRE_LEASE_SCRIPT = """
+local current = redis.call("GET", KEYS[1])
+
+if current then
+    local owner, token = string.match(current, "^(.*):(%d+)$")
+
+    if owner ~= ARGV[1] then
+        return false
+    end
+
+    redis.call("PEXPIRE", KEYS[1], ARGV[2])
+
+    return tonumber(token)
+end
+
+local token = redis.call("INCR", KEYS[2])
+redis.call("SET", KEYS[1], ARGV[1] .. ":" .. token, "PX", ARGV[2])
+
+return token
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+
+return 0
+"""
+
+# Prepended to fenced scripts, the rest of the script only runs while the lease holds the token
+FENCE_SCRIPT = """
+if redis.call("GET", KEYS[1]) ~= ARGV[1] then
+    return false
+end
+"""
+
+
+class LeaseLost(Exception):
+    """The lease was taken by another process while work was done under its fencing token"""
+
+    def __init__(self, name: str, token: int):
+        super().__init__(f"Lease {name} was lost (token {token})")
+
+        self.name = name
+        self.token = token
+
+
+class Lease:
+    """
+    Lease in redis that is held by one process at a time
+
+    Each time the lease changes hands the fencing token increases, so work started
+    under an older token can be told apart
+    """
+
+    def __init__(self, bot, name: str, owner: str, duration: float):
+        self.bot = bot
+        self.name = name
+        self.owner = owner
+        self.duration = duration
+
+        # Fencing token while the lease is held
+        self.token = None
+        self.expires = 0
+
+        self._acquire_script = None
+        self._release_script = None
+
+        self._fenced_scripts = {}  # script: registered script
+
+    @property
+    def key(self):
+        return f"lease.{self.name}"
+
+    @property
+    def is_held(self):
+        return self.token is not None and time.time() < self.expires
+
+    async def acquire(self):
+        """Takes or renews the lease, returns the fencing token if it is held"""
+        if self._acquire_script is None:
+            self._acquire_script = self.bot.redis.register_script(ACQUIRE_LEASE_SCRIPT)
+
+        start = time.time()
+
+        self.token = await self._acquire_script(
+            keys=[self.key, f"{self.key}.token"],
+            args=[self.owner, int(self.duration * 1000)],
+        )
+
+        self.expires = start + self.duration
+
+        return self.token
+
+    def get_fence(self, token: int):
+        """Value of the lease key while it is held with the token"""
+        return f"{self.owner}:{token}"
+
+    async def check(self, token: int):
+        """Renews the lease between the steps of long tasks, raises LeaseLost if the token changed"""
+        if await self.acquire() != token:
+            raise LeaseLost(self.name, token)
+
+    async def run_fenced(self, token: int, script: str, keys: list, args: list = ()):
+        """
+        Runs the script only if the lease is still held with the token, raises LeaseLost otherwise
+
+        KEYS[1] and ARGV[1] are used for the lease, so those of the script start at 2
+        and it has to return something other than false
+        """
+        if (registered := self._fenced_scripts.get(script)) is None:
+            registered = self.bot.redis.register_script(FENCE_SCRIPT + script)
+
+            self._fenced_scripts[script] = registered
+
+        result = await registered(
+            keys=[self.key, *keys], args=[self.get_fence(token), *args]
+        )
+
+        if result is None:
+            raise LeaseLost(self.name, token)
+
+        return result
+
+    async def release(self):
+        if self.token is None:
+            return
+
+        if self._release_script is None:
+            self._release_script = self.bot.redis.register_script(RELEASE_LEASE_SCRIPT)
+
+        await self._release_script(keys=[self.key], args=[self.get_fence(self.token)])
+
+        self.token = None
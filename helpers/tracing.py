@@ -0,0 +1,189 @@
+"""
+Lightweight tracing of commands
+
+A trace is started for a sample of the commands, and spans opened while it is
+running (including in tasks created from it) are added to it through a context variable.
+Finished spans are buffered until the Tracing cog exports them
+"""
+
+import asyncio
+import functools
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from data.constants import TRACE_BUFFER_SIZE
+
+_current_span = ContextVar("current_span", default=None)
+
+# Finished spans waiting to be exported
+_finished = []
+
+# Portion of the commands that are traced, stays 0 until an exporter is set up
+sample_rate = 0
+
+
+class Span:
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "start",
+        "end",
+        "error",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, **attributes):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+
+        self.name = name
+        self.attributes = attributes
+
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        """Duration in seconds"""
+        return (self.end - self.start) / 1e9
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {s: getattr(self, s) for s in self.__slots__}
+
+
+@contextmanager
+def _run_span(span: Span):
+    token = _current_span.set(span)
+
+    try:
+        yield span
+    except BaseException as e:
+        span.error = repr(e)
+        raise
+    finally:
+        span.end = time.time_ns()
+
+        _current_span.reset(token)
+
+        # Dropping spans instead of using more memory if the exporter falls behind
+        if len(_finished) < TRACE_BUFFER_SIZE:
+            _finished.append(span)
+
+
+@contextmanager
+def trace(name: str, **attributes):
+    """Starts a trace for a sample of the calls, yields the root span or None"""
+    if sample_rate == 0 or random.random() >= sample_rate:
+        yield None
+        return
+
+    with _run_span(Span(name, os.urandom(16).hex(), **attributes)) as span:
+        yield span
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Adds a span to the current trace, yields None if nothing is being traced"""
+    parent = _current_span.get()
+
+    if parent is None:
+        yield None
+        return
+
+    with _run_span(Span(name, parent.trace_id, parent.span_id, **attributes)) as child:
+        yield child
+
+
+def traced(name: str = None):
+    """Decorator for adding a span for each call of a function (sync or async)"""
+
+    def decorator(func):
+        span_name = name or func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapped(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapped(*args, **kwargs):
+                with span(span_name):
+                    return func(*args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+def take_finished():
+    """Returns the finished spans and clears the buffer"""
+    global _finished
+
+    spans, _finished = _finished, []
+
+    return spans
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+
+    if isinstance(value, float):
+        return {"doubleValue": value}
+
+    return {"stringValue": str(value)}
+
+
+def to_otlp(spans: list, resource: dict):
+    """Spans in the OTLP/HTTP JSON format"""
+
+    def attributes(data: dict):
+        return [{"key": k, "value": _otlp_value(v)} for k, v in data.items()]
+
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": attributes(resource)},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "wordpractice"},
+                        "spans": [
+                            {
+                                "traceId": s.trace_id,
+                                "spanId": s.span_id,
+                                "parentSpanId": s.parent_id or "",
+                                "name": s.name,
+                                "kind": 1,
+                                "startTimeUnixNano": str(s.start),
+                                "endTimeUnixNano": str(s.end),
+                                "attributes": attributes(s.attributes),
+                                "status": (
+                                    {"code": 2, "message": s.error}
+                                    if s.error
+                                    else {"code": 1}
+                                ),
+                            }
+                            for s in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
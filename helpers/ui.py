@@ -114,7 +114,7 @@ class BaseView(discord.ui.View):
         if isinstance(error, OnGoingTest):
             return await self.ctx.bot.handle_ongoing_test_error(send)
 
-        self.ctx.bot.active_end(self.ctx.author.id)
+        await self.ctx.bot.active_end(self.ctx.author.id)
 
         view = create_link_view({"Support Server": SUPPORT_SERVER_INVITE})
 
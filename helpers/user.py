@@ -1,15 +1,22 @@
+import calendar
 import math
 import time
 from datetime import datetime
 
 from data.constants import (
     AVG_AMT,
+    CONSISTENCY_AMT,
     MIN_PACER_SPEED,
     PACER_PLANES,
     UPDATE_24_HOUR_INTERVAL,
 )
 from static.themes import default
 
+TOTAL_24H_INTERVALS = int(60 * 24 / UPDATE_24_HOUR_INTERVAL)
+
+# The total before the window is kept as well
+RING_24H_SIZE = TOTAL_24H_INTERVALS + 1
+
 
 def get_user_cmds_run(bot, user) -> set:
     return bot.cmds_run.get(user.id, set()) | set(user.cmds_run)
@@ -60,14 +67,17 @@ def get_typing_average(user, amount: int = AVG_AMT):
     user: user data
     amount: how many scores to get the statistics of
     """
+    scores = user.scores[-amount:]
+
+    if amount == AVG_AMT:
+        return (*user.stats.average, scores)
+
     wpm = 0
     raw = 0
     acc = 0
     tw = 0
     cw = 0
 
-    scores = user.scores[-amount:]
-
     for score in scores:
         wpm += score.wpm
         raw += score.raw
@@ -87,40 +97,334 @@ def get_typing_average(user, amount: int = AVG_AMT):
     return wpm, raw, acc, cw, tw, scores
 
 
-def get_daily_stat(stat: list[int]):
-    from helpers.utils import get_start_of_day
+def get_consistency(deviation: float, mean: float) -> float:
+    # Formula by Kogasa: https://github.com/Miodec/monkeytype
+    y = deviation / mean
 
-    # Amount of minutes left in the day
-    time_left = (
-        24 * 60
-        + (
-            time.mktime(get_start_of_day().timetuple())
-            - time.mktime(datetime.utcnow().timetuple())
-        )
-        / 60
+    return round(100 * (1 - math.tanh(y + y**3 / 3 + y**5 / 5)), 2)
+
+
+def get_in_row(scores, condition):
+    """Amount of the latest scores in a row that meet the condition"""
+    amt = 0
+
+    for s in reversed(scores):
+        if not condition(s):
+            break
+
+        amt += 1
+
+    return amt
+
+
+def _get_con_value(score):
+    return score.wpm + score.raw + score.acc
+
+
+def _is_perfect(score):
+    return score.acc == 100
+
+
+def _is_sixty(score):
+    return abs(score.wpm - 60) <= 1
+
+
+def _is_quote(score):
+    return score.test_type_int == 0
+
+
+class ScoreStats:
+    """
+    Rolling statistics of the latest scores, updated in constant time when a score is added
+    Stored on the user as a dict (User.score_stats)
+    """
+
+    __slots__ = (
+        # Timestamp of the latest score included, the statistics are outdated if it changes
+        "last",
+        # Amount of scores in the windows (up to CONSISTENCY_AMT)
+        "amt",
+        # Sums of the last AVG_AMT scores
+        "wpm",
+        "raw",
+        "acc",
+        "cw",
+        "tw",
+        # Sums of wpm + raw + acc and their squares for the consistency
+        "avg_con",
+        "avg_con_sq",
+        "con",
+        "con_sq",
+        # Scores in a row
+        "acc_row",
+        "sixty_row",
+        # Scores in a row on the day of the latest score
+        "day_acc_row",
+        "day_quote_row",
     )
 
-    start_index = int(time_left / UPDATE_24_HOUR_INTERVAL)
+    def __init__(self, data: dict = None):
+        for n in self.__slots__:
+            setattr(self, n, 0)
+
+        self.last = None
+
+        if data:
+            for n, v in data.items():
+                if n in self.__slots__:
+                    setattr(self, n, v)
+
+    @classmethod
+    def from_scores(cls, scores):
+        stats = cls()
+
+        if len(scores) == 0:
+            return stats
+
+        last = scores[-1].timestamp.date()
+
+        avg_scores = scores[-AVG_AMT:]
+        con_values = [_get_con_value(s) for s in scores[-CONSISTENCY_AMT:]]
+
+        stats.last = scores[-1].timestamp
+        stats.amt = len(con_values)
+
+        stats.wpm = sum(s.wpm for s in avg_scores)
+        stats.raw = sum(s.raw for s in avg_scores)
+        stats.acc = sum(s.acc for s in avg_scores)
+        stats.cw = sum(s.cw for s in avg_scores)
+        stats.tw = sum(s.tw for s in avg_scores)
+
+        avg_values = con_values[-AVG_AMT:]
+
+        stats.avg_con = sum(avg_values)
+        stats.avg_con_sq = sum(v * v for v in avg_values)
+        stats.con = sum(con_values)
+        stats.con_sq = sum(v * v for v in con_values)
+
+        stats.acc_row = get_in_row(scores, _is_perfect)
+        stats.sixty_row = get_in_row(scores, _is_sixty)
+
+        stats.day_acc_row = get_in_row(
+            scores, lambda s: _is_perfect(s) and s.timestamp.date() == last
+        )
+        stats.day_quote_row = get_in_row(
+            scores, lambda s: _is_quote(s) and s.timestamp.date() == last
+        )
+
+        return stats
+
+    def to_dict(self):
+        return {n: getattr(self, n) for n in self.__slots__}
+
+    def add(self, score, scores):
+        """
+        score: the score being added
+        scores: the scores before it was added
+        """
+        if len(scores) >= AVG_AMT:
+            old = scores[-AVG_AMT]
+            old_value = _get_con_value(old)
+
+            self.wpm -= old.wpm
+            self.raw -= old.raw
+            self.acc -= old.acc
+            self.cw -= old.cw
+            self.tw -= old.tw
+
+            self.avg_con -= old_value
+            self.avg_con_sq -= old_value * old_value
+
+        if len(scores) >= CONSISTENCY_AMT:
+            old_value = _get_con_value(scores[-CONSISTENCY_AMT])
+
+            self.con -= old_value
+            self.con_sq -= old_value * old_value
+
+        value = _get_con_value(score)
+
+        self.wpm += score.wpm
+        self.raw += score.raw
+        self.acc += score.acc
+        self.cw += score.cw
+        self.tw += score.tw
+
+        self.avg_con += value
+        self.avg_con_sq += value * value
+        self.con += value
+        self.con_sq += value * value
+
+        self.amt = min(len(scores) + 1, CONSISTENCY_AMT)
+
+        self.acc_row = self.acc_row + 1 if _is_perfect(score) else 0
+        self.sixty_row = self.sixty_row + 1 if _is_sixty(score) else 0
+
+        if self.last is None or self.last.date() != score.timestamp.date():
+            self.day_acc_row = 0
+            self.day_quote_row = 0
+
+        self.day_acc_row = self.day_acc_row + 1 if _is_perfect(score) else 0
+        self.day_quote_row = self.day_quote_row + 1 if _is_quote(score) else 0
+
+        self.last = score.timestamp
+
+    @property
+    def average(self):
+        # wpm, raw wpm, accuracy, correct words, total words
+        amt = min(self.amt, AVG_AMT)
+
+        if amt == 0:
+            return 0, 0, 0, 0, 0
+
+        return (
+            round(self.wpm / amt, 2),
+            round(self.raw / amt, 2),
+            round(self.acc / amt, 2),
+            self.cw,
+            self.tw,
+        )
+
+    def get_consistency(self, amount: int = AVG_AMT):
+        """amount: AVG_AMT or CONSISTENCY_AMT"""
+        if amount == AVG_AMT:
+            total, squares = self.avg_con, self.avg_con_sq
+        else:
+            total, squares = self.con, self.con_sq
+
+        amt = min(self.amt, amount)
+
+        if amt == 0 or total <= 0:
+            return 0
+
+        mean = total / amt
+
+        return get_consistency(math.sqrt(max(squares - total * mean, 0)), mean)
+
+    def _get_today_row(self, row: int):
+        if self.last is None or self.last.date() != datetime.utcnow().date():
+            return 0
+
+        return row
+
+    @property
+    def today_acc_row(self):
+        return self._get_today_row(self.day_acc_row)
+
+    @property
+    def today_quote_row(self):
+        return self._get_today_row(self.day_quote_row)
+
+
+def get_24h_interval(timestamp: float = None) -> int:
+    """Index of the UPDATE_24_HOUR_INTERVAL long interval since the epoch"""
+    if timestamp is None:
+        timestamp = time.time()
+
+    return int(timestamp / (UPDATE_24_HOUR_INTERVAL * 60))
+
+
+class RollingStat:
+    """
+    Stat over the last 24 hours in UPDATE_24_HOUR_INTERVAL buckets, stored on the user as a dict
+
+    values is a ring of running totals, values[i % RING_24H_SIZE] is the total added up to the end of
+    interval i for the intervals head - TOTAL_24H_INTERVALS to head, so any sum is the difference of two totals
+    """
+
+    __slots__ = ("head", "values")
+
+    def __init__(self, data: dict = None):
+        if data:
+            self.head = data["head"]
+            self.values = data["values"]
+        else:
+            self.head = None
+            self.values = [0] * RING_24H_SIZE
+
+    @classmethod
+    def from_list(cls, stat: list[int], last_save: datetime):
+        """Converts the list of intervals ending at the last save that was used before"""
+        rolling = cls()
+
+        if not stat:
+            return rolling
+
+        head = get_24h_interval(calendar.timegm(last_save.utctimetuple()))
+
+        stat = stat[-TOTAL_24H_INTERVALS:]
+
+        for i, amount in enumerate(stat, start=head - len(stat) + 1):
+            rolling.add(amount, i)
+
+        return rolling
+
+    def to_dict(self):
+        return {"head": self.head, "values": self.values}
+
+    @property
+    def total(self):
+        if self.head is None:
+            return 0
+
+        return self.values[self.head % RING_24H_SIZE]
+
+    def add(self, amount: int, interval: int = None):
+        if interval is None:
+            interval = get_24h_interval()
+
+        if self.head is None or interval - self.head >= RING_24H_SIZE:
+            self.values = [0] * RING_24H_SIZE
+
+        elif interval > self.head:
+            # Carrying the total over the intervals without anything added
+            total = self.total
+
+            for i in range(self.head + 1, interval + 1):
+                self.values[i % RING_24H_SIZE] = total
+
+        else:
+            interval = self.head
+
+        self.head = interval
+        self.values[interval % RING_24H_SIZE] += amount
+
+    def get_sum(self, start: int):
+        """Sum of the intervals from start (inclusive) to now"""
+        if self.head is None or start > self.head:
+            return 0
+
+        start = max(start, self.head - TOTAL_24H_INTERVALS + 1)
+
+        return self.total - self.values[(start - 1) % RING_24H_SIZE]
 
-    return sum(stat[start_index:])
+    def get_amounts(self, start: int):
+        """Amount added in each interval from start (inclusive) to now {interval: amount}"""
+        if self.head is None or start > self.head:
+            return {}
 
+        start = max(start, self.head - TOTAL_24H_INTERVALS + 1)
 
-def get_24h_stat(stat: list[int], last_save: datetime):
-    # Getting the amount of minutes since the last save
-    passed = (datetime.utcnow() - last_save).total_seconds() / 60
+        amounts = {}
 
-    total_min = 60 * 24
+        for i in range(start, self.head + 1):
+            amount = (
+                self.values[i % RING_24H_SIZE] - self.values[(i - 1) % RING_24H_SIZE]
+            )
 
-    total_intervals = int(total_min / UPDATE_24_HOUR_INTERVAL)
+            if amount:
+                amounts[i] = amount
 
-    if passed >= total_min:
-        return [0] * total_intervals
+        return amounts
 
-    intervals = math.floor(passed / UPDATE_24_HOUR_INTERVAL)
+    @property
+    def sum(self):
+        return self.get_sum(get_24h_interval() - TOTAL_24H_INTERVALS + 1)
 
-    sliced = stat[intervals : total_intervals + 1]
+    @property
+    def today(self):
+        now = time.time()
 
-    return sliced + [0] * (total_intervals - len(sliced))
+        return self.get_sum(get_24h_interval(now - now % (24 * 60 * 60)))
 
 
 def get_pacer_speed(user, zone: str):
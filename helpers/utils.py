@@ -1,16 +1,17 @@
 import calendar
 import difflib
 import functools
-import math
 import random
 from bisect import bisect
 from datetime import datetime, timezone
-from typing import TYPE_CHECKING, Callable
+from typing import TYPE_CHECKING, Callable, NamedTuple
 
 import discord
 from discord import SlashCommand, SlashCommandGroup, UserCommand
 from discord.ext import commands
 
+import helpers.metrics as metrics
+import helpers.tracing as tracing
 from data.constants import LB_LENGTH, SUPPORT_SERVER_INVITE, TEST_ZONES
 from data.icons import h_progress_bar, overflow_bar, v_progress_bar
 from helpers.ui import create_link_view
@@ -301,26 +302,7 @@ def is_today(d):
     return d.date() == today
 
 
-# Calculates consistency from scores
-# Formula by Kogasa: https://github.com/Miodec/monkeytype
-def calculate_consistency(nums: list) -> float:
-    length = len(nums)
-    mean = sum(nums) / length
-
-    x = math.sqrt(sum([(x - mean) ** 2 for x in nums]))
-    y = x / mean
-
-    return round(100 * (1 - math.tanh(y + y**3 / 3 + y**5 / 5)), 2)
-    # lol
-
-
-def calculate_score_consistency(scores):
-    if len(scores) == 0:
-        return 0
-
-    return calculate_consistency([s.wpm + s.raw + s.acc for s in scores])
-
-
+@tracing.traced("evaluate_test")
 def get_test_stats(u_input, quote, end_time):
     cc, extra_cc, cw, rws, wrong = get_test_input_stats(u_input, quote)
 
@@ -420,6 +402,17 @@ def get_test_zone_name(cw: int):
     return n, f"({r[0]}-{r[-1]} words)"
 
 
+# Counts and times the function while it waits for and runs in the executor
+async def _run_timed(loop, name: str, func):
+    metrics.EXECUTOR_PENDING.inc()
+
+    try:
+        with metrics.EXECUTOR_TIME.time(name), tracing.span(f"executor.{name}"):
+            return await loop.run_in_executor(None, func)
+    finally:
+        metrics.EXECUTOR_PENDING.dec()
+
+
 # https://stackoverflow.com/a/64506715
 def run_in_executor(include_bot=False):
     def decorator(_func):
@@ -430,7 +423,7 @@ def run_in_executor(include_bot=False):
             else:
                 func = functools.partial(_func, *args, **kwargs)
 
-            return bot.loop.run_in_executor(executor=None, func=func)
+            return _run_timed(bot.loop, _func.__name__, func)
 
         return wrapped
 
@@ -511,6 +504,13 @@ async def get_users_from_lb(bot, lb: dict):
     return data
 
 
+class LBUser(NamedTuple):
+    """The user fields needed to display a leaderboard row"""
+
+    id: int
+    display_name: str
+
+
 def get_lb_display(p, unit, u, value, author_id=None):
     extra = "__" if author_id is not None and u.id == author_id else ""
 
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+import helpers.metrics as metrics
+from data.constants import LOOP_LAG_INTERVAL, LOOP_LAG_THRESHOLD
+
+# Frames from the repository are preferred when blaming a stall
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _is_own_frame(frame: traceback.FrameSummary):
+    path = os.path.abspath(frame.filename)
+
+    return path.startswith(ROOT) and os.sep + "site-packages" + os.sep not in path
+
+
+def _get_callback_frames(stack: traceback.StackSummary):
+    """Frames of the callback the loop is running, without the loop itself"""
+    for i in range(len(stack) - 1, -1, -1):
+        f = stack[i]
+
+        if f.name == "_run" and f.filename.endswith(
+            os.path.join("asyncio", "events.py")
+        ):
+            return stack[i + 1 :] or stack
+
+    return stack
+
+
+def get_culprit(stack: traceback.StackSummary):
+    """The innermost function from the repository in the stack (or the innermost function)"""
+    frames = _get_callback_frames(stack)
+
+    frame = next((f for f in reversed(frames) if _is_own_frame(f)), frames[-1])
+
+    path = os.path.relpath(frame.filename, ROOT)
+
+    return f"{path}:{frame.name}"
+
+
+class LoopWatchdog:
+    """
+    Measures how late the event loop wakes up from a short sleep
+
+    A thread samples the stack of the loop while it is blocked for longer than the
+    threshold, so each stall is blamed on the function that appeared most in the samples
+
+    on_stall: (lag, culprit, stack) -> None, called from the loop after a stall
+    """
+
+    def __init__(
+        self,
+        on_stall,
+        *,
+        interval: float = LOOP_LAG_INTERVAL,
+        threshold: float = LOOP_LAG_THRESHOLD,
+    ):
+        self.on_stall = on_stall
+
+        self.interval = interval
+        self.threshold = threshold
+
+        self.last_beat = time.monotonic()
+
+        self._thread_id = None
+        self._samples = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        # Statistics {beats, stalls, samples}
+        self.stats = Counter()
+
+    async def run(self):
+        self._thread_id = threading.get_ident()
+        self._stopped.clear()
+
+        threading.Thread(
+            target=self._monitor, name="loop-watchdog", daemon=True
+        ).start()
+
+        try:
+            while True:
+                start = time.monotonic()
+
+                await asyncio.sleep(self.interval)
+
+                self.last_beat = now = time.monotonic()
+
+                self._beat(now - start - self.interval)
+        finally:
+            self._stopped.set()
+
+    def _beat(self, lag: float):
+        lag = max(lag, 0)
+
+        self.stats["beats"] += 1
+        metrics.LOOP_LAG.observe(value=lag)
+
+        with self._lock:
+            samples, self._samples = self._samples, []
+
+        if lag < self.threshold:
+            return
+
+        self.stats["stalls"] += 1
+
+        if samples:
+            culprits = Counter(get_culprit(s) for s in samples)
+            culprit = culprits.most_common(1)[0][0]
+
+            stack = next(s for s in samples if get_culprit(s) == culprit)
+        else:
+            # The stall ended before the thread could sample it
+            culprit, stack = "unknown", None
+
+        metrics.LOOP_STALLS.inc(culprit)
+
+        self.on_stall(lag, culprit, stack)
+
+    def _monitor(self):
+        while not self._stopped.wait(self.interval):
+            if time.monotonic() - self.last_beat < self.threshold:
+                continue
+
+            frame = sys._current_frames().get(self._thread_id)
+
+            if frame is None:
+                continue
+
+            stack = traceback.extract_stack(frame)
+
+            # Ignoring the loop waiting for events, which isn't blocking
+            if stack[-1].name == "select":
+                continue
+
+            self.stats["samples"] += 1
+
+            with self._lock:
+                self._samples.append(stack)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from collections import Counter
+
+import discord
+
+from data.constants import LOG_FLUSH_INTERVAL, LOG_QUEUE_SIZE
+
+# Limits of a single webhook message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARS = 6000
+
+log = logging.getLogger(__name__)
+
+
+class LogShipper:
+    """
+    Queues the embeds sent to a webhook and sends them in batches from a background task
+
+    A batch is sent once it has 10 embeds or the oldest embed has waited LOG_FLUSH_INTERVAL
+    """
+
+    def __init__(self, webhook: discord.Webhook, name: str):
+        self.webhook = webhook
+        self.name = name
+
+        self.queue = asyncio.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._task = None
+
+        # Statistics {queued, dropped, sent, messages, failed}
+        self.stats = Counter()
+
+    async def send(self, embed: discord.Embed = None, embeds: list = None):
+        """Same arguments as Webhook.send, returns straight away"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._worker())
+
+        for e in [embed] if embed is not None else embeds or []:
+            try:
+                self.queue.put_nowait(e)
+            except asyncio.QueueFull:
+                # Dropping logs instead of slowing down commands
+                self.stats["dropped"] += 1
+            else:
+                self.stats["queued"] += 1
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            embed = await self.queue.get()
+
+            # Closing
+            if embed is None:
+                return
+
+            embeds = [embed]
+
+            deadline = loop.time() + LOG_FLUSH_INTERVAL
+
+            while len(embeds) < MAX_EMBEDS:
+                try:
+                    embed = await asyncio.wait_for(
+                        self.queue.get(), max(deadline - loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+                if embed is None:
+                    return await self._send(embeds)
+
+                embeds.append(embed)
+
+            await self._send(embeds)
+
+    async def _send(self, embeds: list):
+        for batch in _split_embeds(embeds):
+            try:
+                await self.webhook.send(embeds=batch)
+            except Exception:
+                self.stats["failed"] += len(batch)
+                log.exception(f"Failed to send logs to the {self.name} webhook")
+            else:
+                self.stats["sent"] += len(batch)
+                self.stats["messages"] += 1
+
+    async def close(self):
+        """Sends whatever is left in the queue and stops the background task"""
+        if self._task is None:
+            return
+
+        await self.queue.put(None)
+        await self._task
+
+        self._task = None
+
+
+def _split_embeds(embeds: list):
+    """Groups the embeds into messages that are within Discord's limits"""
+    batch = []
+    chars = 0
+
+    for e in embeds:
+        size = len(e)
+
+        if batch and (len(batch) == MAX_EMBEDS or chars + size > MAX_EMBED_CHARS):
+            yield batch
+
+            batch = []
+            chars = 0
+
+        batch.append(e)
+        chars += size
+
+    if batch:
+        yield batch
@@ -4,7 +4,10 @@ from bot import WordPractice
 from config import DEBUG_GUILD_ID
 
 
-def main():
+def main(**kwargs):
+    """
+    kwargs: cluster options when running as part of a cluster (see cluster.py)
+    """
     intents = discord.Intents.none()
 
     # Privileged intents
@@ -23,6 +26,7 @@ def main():
         help_command=None,
         debug_guild=DEBUG_GUILD_ID,
         intents=intents,
+        **kwargs,
     )
 
     bot.run()
@@ -0,0 +1,116 @@
+"""
+Summarises the command traces written to TRACE_FILE
+
+Shows the time spent in each span and breaks down the slowest traces
+
+Usage: python traces.py traces.jsonl --command tt --top 5
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from statistics import quantiles
+
+
+def load_traces(path: str):
+    """Returns {trace_id: [spans]}"""
+    traces = defaultdict(list)
+
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                span["duration"] = (span["end"] - span["start"]) / 1e6
+
+                traces[span["trace_id"]].append(span)
+
+    return traces
+
+
+def get_root(spans: list):
+    return next((s for s in spans if s["parent_id"] is None), None)
+
+
+def _percentile(values: list, p: int):
+    if len(values) == 1:
+        return values[0]
+
+    return quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def print_span_summary(traces: dict):
+    durations = defaultdict(list)
+
+    for spans in traces.values():
+        for s in spans:
+            durations[s["name"]].append(s["duration"])
+
+    print(f"{'span':<32} {'count':>7} {'p50':>9} {'p95':>9} {'max':>9}")
+
+    for name, values in sorted(durations.items(), key=lambda x: -sum(x[1])):
+        print(
+            f"{name:<32} {len(values):>7} "
+            f"{_percentile(values, 50):>7.1f}ms "
+            f"{_percentile(values, 95):>7.1f}ms "
+            f"{max(values):>7.1f}ms"
+        )
+
+
+def print_trace(spans: list):
+    children = defaultdict(list)
+
+    for s in spans:
+        children[s["parent_id"]].append(s)
+
+    root = get_root(spans)
+
+    def show(span, depth):
+        error = f"  ({span['error']})" if span["error"] else ""
+        offset = f"+{(span['start'] - root['start']) / 1e6:.1f}ms"
+
+        print(
+            f"  {'  ' * depth}{span['name']:<{40 - depth * 2}} "
+            f"{offset:>10} {span['duration']:>8.1f}ms{error}"
+        )
+
+        for c in sorted(children[span["span_id"]], key=lambda s: s["start"]):
+            show(c, depth + 1)
+
+    show(root, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("file")
+    parser.add_argument("--command", help="only show the traces of the command")
+    parser.add_argument("--top", type=int, default=5, help="slowest traces to show")
+
+    args = parser.parse_args()
+
+    traces = {
+        trace_id: spans
+        for trace_id, spans in load_traces(args.file).items()
+        if (root := get_root(spans)) is not None
+        and (args.command is None or root["name"] == args.command)
+    }
+
+    if not traces:
+        print("No traces found")
+        return
+
+    print(f"{len(traces)} traces\n")
+
+    print_span_summary(traces)
+
+    slowest = sorted(traces.values(), key=lambda s: -get_root(s)["duration"])
+
+    for spans in slowest[: args.top]:
+        root = get_root(spans)
+
+        print(f"\nTrace {root['trace_id']} ({root['attributes']})")
+
+        print_trace(spans)
+
+
+if __name__ == "__main__":
+    main()